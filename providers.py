@@ -7,37 +7,76 @@ allowing seamless switching between OpenAI and Google Gemini.
 """
 
 import os
+import re
 import json
+import time
+import asyncio
+import hashlib
 import logging
+import sqlite3
+import functools
+import tempfile
+import httpx
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
+from typing import List, Dict, Any, Optional, Callable, Iterable, Literal, Mapping, NamedTuple
+from pydantic import BaseModel, ConfigDict
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+from settings import env_config
+
+try:
+    import orjson  # Optional: faster parsing of API responses
+except ImportError:
+    import json as orjson
 
 logger = logging.getLogger(__name__)
 
 
-class AIProvider(ABC):
-    """Abstract base class for AI providers."""
-    
-    def __init__(self):
-        """Initialize the provider."""
-        load_dotenv()
-        self.setup_client()
-    
-    @abstractmethod
-    def setup_client(self):
-        """Set up the AI client with API key."""
-        pass
-    
-    @abstractmethod
-    def validate_batch_with_ai(self, batch: List[Dict]) -> List[Dict]:
-        """Validate a batch of pharmacies using the AI provider."""
-        pass
-    
-    def create_validation_prompt(self, pharmacies_batch: List[Dict]) -> str:
-        """Create a prompt for AI to validate pharmacy states of operation."""
-        
-        prompt = """You are a healthcare regulatory expert specializing in pharmacy licensing and operations across U.S. states. 
+# Context window per model, used to size batches by token budget
+MODEL_MAX_TOKENS = {
+    'gpt-4o': 128_000,
+    'gpt-4o-mini': 128_000,
+    'gpt-4.1': 1_047_576,
+    'o3': 200_000,
+    'o3-deep-research': 200_000,
+    'o4-mini': 200_000,
+    'o4-mini-deep-research': 200_000,
+    'gemini-2.5-pro': 1_048_576,
+    'gemini-2.5-flash': 1_048_576,
+}
+DEFAULT_MODEL_MAX_TOKENS = 128_000
+# Completion token limit per model; a batch's expected output must fit it
+MODEL_MAX_OUTPUT_TOKENS = {
+    'gpt-4o': 16_384,
+    'gpt-4o-mini': 16_384,
+    'gpt-4.1': 32_768,
+    'o3': 100_000,
+    'o3-deep-research': 100_000,
+    'o4-mini': 100_000,
+    'o4-mini-deep-research': 100_000,
+    'gemini-2.5-pro': 65_536,
+    'gemini-2.5-flash': 65_536,
+}
+DEFAULT_MODEL_MAX_OUTPUT_TOKENS = 16_384
+# Share of the context window a batch (prompt + expected output) may fill
+CONTEXT_BUDGET_RATIO = 0.7
+# Expected response size per pharmacy; also sizes the output token limit
+OUTPUT_TOKENS_PER_PHARMACY = 150
+MIN_OUTPUT_TOKENS = 4000
+
+# Connection pool shared by all requests a provider makes
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=64, max_connections=128)
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+# Static system prompt: expert instructions, then the required response format
+_BASE_HEADER = """You are a healthcare regulatory expert specializing in pharmacy licensing and operations across U.S. states. 
 
 Your task is to verify if the listed "states of operation" for each mail-order pharmacy are accurate based on current regulatory information, licensing requirements, and known operational status.
 
@@ -52,73 +91,656 @@ For each pharmacy, search and analyze:
 
 IMPORTANT: Base your analysis on factual, up-to-date regulatory information found through web search, not assumptions or outdated knowledge.
 
-Pharmacies to validate:
-"""
-        
-        for i, pharmacy in enumerate(pharmacies_batch, 1):
-            prompt += f"""
-{i}. Pharmacy: {pharmacy.get('StoreName', 'N/A')}
-   Address: {pharmacy.get('Address1', 'N/A')}, {pharmacy.get('City', 'N/A')}, {pharmacy.get('State', 'N/A')} {pharmacy.get('ZipCode', 'N/A')}
-   Current listed states of operation: {pharmacy.get('Operates in states', 'N/A')}
-   NCPDP ID: {pharmacy.get('NCPDPID', 'N/A')}
-"""
+The pharmacies to validate are listed in the user message as tab-separated rows with a header line. The columns are: idx (use it as "pharmacy_index"), name, address, states (the current listed states of operation) and ncpdpid (NCPDP ID).
 
-        prompt += """
+"""
 
-For each pharmacy, provide your response in this EXACT JSON format:
+_BASE_FOOTER = """For each pharmacy, provide your response in this EXACT JSON format:
 {
   "validations": [
     {
       "pharmacy_index": 1,
       "is_correct": true/false,
-      "corrected_states": "Only provide if different from original - use same format as input",
+      "corrected_states": "Empty unless different from original - use same format as input",
       "confidence": "high/medium/low",
       "reasoning": "Brief explanation of your findings"
     }
   ]
 }
 
-Only include "corrected_states" if the original information is incorrect. Use the same format as the input (e.g., "Nationwide", "State1, State2, State3", or "All states except State1").
+Leave "corrected_states" empty if the original information is correct. Use the same format as the input (e.g., "Nationwide", "State1, State2, State3", or "All states except State1").
+"""
+
+# Per-batch user message: this header followed by one tab-separated row per
+# pharmacy, which spends far fewer tokens on labels than a block per pharmacy
+PROMPT_HEADER = "Pharmacies to validate:\n# idx\tname\taddress\tstates\tncpdpid\n"
+
+
+@functools.lru_cache(maxsize=4)
+def _google_enhancement(enable_search: bool, enable_url: bool) -> str:
+    """Return the Google search strategy hints for the enabled grounding features."""
+    
+    if not (enable_search or enable_url):
+        return ""
+    
+    search_enhancement = """
+
+SEARCH STRATEGY (Use Google Search to find current information):
+"""
+    
+    if enable_search:
+        search_enhancement += """
+- Search for "[pharmacy name] licensing states" to find current operational scope
+- Search for "[pharmacy name] pharmacy board license" for official records
+- Search for "mail order pharmacy licensing [state name]" for state-specific requirements
 """
+    
+    if enable_url:
+        search_enhancement += """
+- Reference specific state pharmacy board websites:
+  * "[state].gov pharmacy board" or "[state] board of pharmacy"
+  * NABP (National Association of Boards of Pharmacy) database
+  * State-specific pharmacy licensing verification portals
+"""
+        
+        # Add specific URLs for major states
+        search_enhancement += """
+- Key regulatory websites to check:
+  * https://www.nabp.pharmacy/ (National database)
+  * State pharmacy board websites for license verification
+  * FDA registered mail-order pharmacy databases
+"""
+    
+    return search_enhancement
+
+
+# CSV columns used in the prompt, in Pharmacy field order
+PROMPT_COLS = ['StoreName', 'Address1', 'City', 'State', 'ZipCode', 'Operates in states', 'NCPDPID']
+
+
+class Pharmacy(NamedTuple):
+    """Prompt fields of one pharmacy row; missing values are 'N/A'."""
+    StoreName: str = 'N/A'
+    Address1: str = 'N/A'
+    City: str = 'N/A'
+    State: str = 'N/A'
+    ZipCode: str = 'N/A'
+    OperatesInStates: str = 'N/A'
+    NCPDPID: str = 'N/A'
+
+    @classmethod
+    def from_record(cls, record: Dict) -> 'Pharmacy':
+        """Build a Pharmacy from a CSV row dict, mapping empty cells to 'N/A'."""
+        
+        def field(column: str) -> str:
+            value = record.get(column)
+            # NaN is the only value not equal to itself
+            if value is None or value != value:
+                return 'N/A'
+            # Collapse tabs and newlines so a value stays in its prompt column
+            return ' '.join(str(value).split())
+        
+        return cls(*(field(column) for column in PROMPT_COLS))
+
+
+def _fmt_pharmacy(i: int, p: Pharmacy) -> str:
+    """Format one numbered, tab-separated pharmacy row of the user message."""
+    return f"{i}\t{p.StoreName}\t{p.Address1}, {p.City}, {p.State} {p.ZipCode}\t{p.OperatesInStates}\t{p.NCPDPID}\n"
+
+
+@functools.lru_cache(maxsize=None)
+def _tiktoken_encoding(model: str):
+    """Return the tiktoken encoding for a model, or None if unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('o200k_base')
+    except Exception as e:
+        # Encodings are downloaded on first use; fall back to estimating
+        logger.warning(f"tiktoken encoding unavailable, estimating tokens: {str(e)}")
+        return None
+
+
+def _pack_batches(
+    pharmacies: List[Pharmacy],
+    model: str,
+    count_tokens: Callable[[str], int],
+    prompt_tokens: int,
+    target_tokens: int,
+    max_batch_size: int = 0,
+) -> List[List[int]]:
+    """Group pharmacies into batches by input token count; return their indexes.
+    
+    A batch grows while its input tokens (prompt plus rows) stay within
+    target_tokens, its expected output (OUTPUT_TOKENS_PER_PHARMACY per
+    pharmacy) fits the model's completion limit and input plus output stay
+    under CONTEXT_BUDGET_RATIO of the model's context window.
+    max_batch_size, if set, also caps the number of pharmacies per batch.
+    Each batch lists the positions of its pharmacies in ``pharmacies``.
+    """
+    budget = CONTEXT_BUDGET_RATIO * MODEL_MAX_TOKENS.get(model, DEFAULT_MODEL_MAX_TOKENS)
+    max_output = MODEL_MAX_OUTPUT_TOKENS.get(model, DEFAULT_MODEL_MAX_OUTPUT_TOKENS)
+    batches = []
+    batch: List[int] = []
+    input_tokens = prompt_tokens
+    
+    for index, pharmacy in enumerate(pharmacies):
+        tokens = count_tokens(_fmt_pharmacy(len(batch) + 1, pharmacy))
+        if batch and (
+            input_tokens + tokens > target_tokens
+            or OUTPUT_TOKENS_PER_PHARMACY * (len(batch) + 1) > max_output
+            or input_tokens + tokens + OUTPUT_TOKENS_PER_PHARMACY * (len(batch) + 1) > budget
+            or 0 < max_batch_size <= len(batch)
+        ):
+            batches.append(batch)
+            batch = []
+            input_tokens = prompt_tokens
+        batch.append(index)
+        input_tokens += tokens
+    
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class ValidationResult(BaseModel):
+    """Validation verdict for one pharmacy in a batch."""
+    model_config = ConfigDict(extra='forbid')
+
+    pharmacy_index: int
+    is_correct: bool
+    corrected_states: str
+    confidence: Literal['high', 'medium', 'low']
+    reasoning: str
+
+
+class ValidationResponse(BaseModel):
+    """Structured response schema requested from the AI providers."""
+    model_config = ConfigDict(extra='forbid')
+
+    validations: List[ValidationResult]
+
+
+# OpenAI structured outputs: the model is constrained to emit this schema
+VALIDATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "pharmacy_validations",
+        "schema": ValidationResponse.model_json_schema(),
+        "strict": True
+    }
+}
+
+
+def error_validations(batch_size: int, reasoning: str) -> List[Dict]:
+    """Build placeholder results for a batch that could not be validated."""
+    return [
+        {
+            "pharmacy_index": i + 1,
+            "is_correct": None,
+            "corrected_states": "",
+            "confidence": "error",
+            "reasoning": reasoning
+        } for i in range(batch_size)
+    ]
+
+
+def _prompt_hash(prompt: str) -> str:
+    """Return a short, stable digest identifying a prompt."""
+    return hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+
+
+def normalize_states(states: Any) -> str:
+    """Normalize a states-of-operation string so equivalent listings compare equal."""
+    parts = (part.strip().lower() for part in str(states).split(','))
+    return ', '.join(sorted(part for part in parts if part))
+
+
+class ValidationCache:
+    """SQLite-backed cache of validation results keyed by the pharmacy record.
+    
+    Re-runs after failures and overlapping input files repeat the same rows,
+    so their results can be reused instead of re-queried. Keys also cover the
+    provider, model and prompt, and entries older than ttl seconds (if set)
+    are ignored, since licensing data goes stale.
+    """
+    
+    def __init__(self, path: str, ttl: float = 0):
+        self.ttl = ttl
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS validations (key TEXT PRIMARY KEY, result TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self.conn.commit()
+    
+    @staticmethod
+    def key_for(pharmacy: Pharmacy, namespace: str = '') -> str:
+        """Return the cache key for a pharmacy: a hash of every prompt field.
         
-        return prompt
+        States are normalized so equivalent listings share a key. namespace
+        identifies the provider, model and prompt that produced the result.
+        """
+        record = pharmacy._replace(OperatesInStates=normalize_states(pharmacy.OperatesInStates))
+        return _prompt_hash(namespace + json.dumps(record._asdict(), sort_keys=True))
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached validation for a key, or None if missing or expired."""
+        oldest = time.time() - self.ttl if self.ttl > 0 else 0
+        row = self.conn.execute(
+            "SELECT result FROM validations WHERE key = ? AND created >= ?", (key, oldest)
+        ).fetchone()
+        return orjson.loads(row[0]) if row else None
+    
+    def set_many(self, items: Dict[str, Dict]):
+        """Store several validations in one transaction."""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO validations (key, result, created) VALUES (?, ?, ?)",
+            [(key, json.dumps(result), now) for key, result in items.items()]
+        )
+        self.conn.commit()
+
+
+def cached_validation(method: Callable) -> Callable:
+    """Decorate validate_batch_with_ai so cached pharmacies skip the API call.
+    
+    Only pharmacies missing from the provider's ValidationCache are sent to
+    the wrapped method (renumbered from 1); the results are stored and merged
+    back with the cached ones using the original pharmacy_index. In the async
+    path, pharmacies already being validated by a concurrent batch are not
+    sent again but share that request's result.
+    """
+    
+    if asyncio.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def async_wrapper(self, batch: List[Pharmacy]) -> List[Dict]:
+            keys, results, pending = self.lookup_cached(batch)
+            owned, waiting = self.claim_inflight(keys, pending)
+            if owned:
+                try:
+                    validations = await method(self, [batch[i] for i in owned])
+                    self.store_validations(keys, results, owned, validations)
+                finally:
+                    self.release_inflight(keys, results, owned)
+            for i, future in waiting.items():
+                shared = await future
+                if shared is not None:
+                    results[i] = {**shared, "pharmacy_index": i + 1}
+            return [result for result in results if result is not None]
+        return async_wrapper
+    
+    @functools.wraps(method)
+    def wrapper(self, batch: List[Pharmacy]) -> List[Dict]:
+        keys, results, pending = self.lookup_cached(batch)
+        if pending:
+            validations = method(self, [batch[i] for i in pending])
+            self.store_validations(keys, results, pending, validations)
+        return [result for result in results if result is not None]
+    return wrapper
+
+
+def _parse_reset_duration(value: str) -> float:
+    """Convert a rate-limit reset header such as '6m0s' or '250ms' to seconds."""
+    units = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+    return sum(float(amount) * units[unit] for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value))
+
+
+def _provider_should_retry(retry_state: RetryCallState) -> bool:
+    """Retry only when the provider classifies the raised error as transient."""
+    if not retry_state.outcome.failed:
+        return False
+    provider = retry_state.args[0]
+    return provider.is_retryable_error(retry_state.outcome.exception())
+
+
+# Exponential backoff with jitter, shared by the sync and async call paths.
+# Non-retryable errors and the last transient error are re-raised unchanged.
+RETRY_POLICY = dict(
+    wait=wait_exponential_jitter(initial=1, max=60),
+    stop=stop_after_attempt(6),
+    reraise=True,
+)
+
+with_retry = retry(retry=_provider_should_retry, **RETRY_POLICY)
+
+
+class AIProvider(ABC):
+    """Abstract base class for AI providers."""
+    
+    # Provider name, part of the validation cache key
+    PROVIDER_NAME = ''
+    # True for providers that submit all batches as one job; callers should
+    # then read the whole input at once instead of in chunks
+    SUBMITS_ONE_JOB = False
+    
+    def __init__(self, config: Optional[Mapping[str, str]] = None):
+        """Initialize the provider from a settings mapping (default: env_config())."""
+        self.config = config if config is not None else env_config()
+        self.max_concurrency = int(self.config.get('MAX_CONCURRENCY') or '20')
+        self.requests_per_minute = int(self.config.get('REQUESTS_PER_MINUTE') or '0')
+        # Input tokens (prompt plus pharmacy rows) to aim for per batch
+        self.target_tokens = int(self.config.get('TARGET_TOKENS') or '6000')
+        cache_path = self.config.get('VALIDATION_CACHE', '.validation_cache.sqlite')
+        cache_ttl_days = float(self.config.get('VALIDATION_CACHE_TTL_DAYS') or '30')
+        self.cache = ValidationCache(cache_path, cache_ttl_days * 86400) if cache_path else None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._warmed_up = False
+        # Monotonic time before which no new request is sent (rate-limit reset)
+        self._not_before = 0.0
+        # Keep-alive HTTP/2 connections reused by every async request
+        self.http_client = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        self.setup_client()
+    
+    @abstractmethod
+    def setup_client(self):
+        """Set up the AI client with API key."""
+        pass
+    
+    @abstractmethod
+    def validate_batch_with_ai(self, batch: List[Pharmacy]) -> List[Dict]:
+        """Validate a batch of pharmacies using the AI provider."""
+        pass
+
+    @abstractmethod
+    async def avalidate_batch_with_ai(self, batch: List[Pharmacy]) -> List[Dict]:
+        """Validate a batch of pharmacies using the provider's async client."""
+        pass
+
+    @functools.cached_property
+    def cache_namespace(self) -> str:
+        """Hash of the provider, model and prompt, so results from another setup are not reused."""
+        return _prompt_hash("\n".join([
+            self.PROVIDER_NAME,
+            self.model,
+            self.get_system_prompt(),
+            self.render_user_message([])
+        ]))
+
+    def lookup_cached(self, batch: List[Pharmacy]):
+        """Split a batch into cached results and indexes still to be queried."""
+        keys = [ValidationCache.key_for(pharmacy, self.cache_namespace) for pharmacy in batch]
+        results: List[Optional[Dict]] = [None] * len(batch)
+        pending = []
+        
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is None:
+                pending.append(i)
+            else:
+                results[i] = {**cached, "pharmacy_index": i + 1}
+        
+        if len(pending) < len(batch):
+            logger.info(f"{len(batch) - len(pending)} of {len(batch)} pharmacies served from validation cache")
+        return keys, results, pending
+
+    def store_validations(self, keys: List[str], results: List[Optional[Dict]], pending: List[int], validations: List[Dict]):
+        """Merge fresh validations into results and cache the successful ones."""
+        to_cache = {}
+        
+        for validation in validations:
+            sub_idx = validation.get('pharmacy_index', 1) - 1
+            if not 0 <= sub_idx < len(pending):
+                continue
+            
+            batch_idx = pending[sub_idx]
+            results[batch_idx] = {**validation, "pharmacy_index": batch_idx + 1}
+            if validation.get('confidence') != 'error' and validation.get('is_correct') is not None:
+                to_cache[keys[batch_idx]] = {k: v for k, v in validation.items() if k != 'pharmacy_index'}
+        
+        if to_cache and self.cache is not None:
+            self.cache.set_many(to_cache)
+
+    def claim_inflight(self, keys: List[str], pending: List[int]):
+        """Split pending indexes into ones to query and ones already in flight.
+        
+        Returns the indexes this call must query (now registered as in flight)
+        and a mapping of the remaining indexes to the futures they can await.
+        """
+        loop = asyncio.get_running_loop()
+        owned = []
+        waiting = {}
+        
+        for i in pending:
+            future = self._inflight.get(keys[i])
+            if future is None:
+                self._inflight[keys[i]] = loop.create_future()
+                owned.append(i)
+            else:
+                waiting[i] = future
+        
+        return owned, waiting
+
+    def release_inflight(self, keys: List[str], results: List[Optional[Dict]], owned: List[int]):
+        """Publish results for in-flight pharmacies to any waiting batches."""
+        for i in owned:
+            future = self._inflight.pop(keys[i], None)
+            if future is not None and not future.done():
+                future.set_result(results[i])
+
+    def is_retryable_error(self, error: BaseException) -> bool:
+        """Return True for transient API errors (rate limits, timeouts)."""
+        return False
+
+    def defer_requests(self, delay: float):
+        """Hold back every worker's next request for delay seconds."""
+        self._not_before = max(self._not_before, time.monotonic() + delay)
+
+    async def wait_for_capacity(self):
+        """Sleep until the provider's rate limit has reset, if it is exhausted."""
+        delay = self._not_before - time.monotonic()
+        if delay > 0:
+            logger.info(f"Rate limit reached, waiting {delay:.1f}s for it to reset")
+            await asyncio.sleep(delay)
+
+    async def call_with_retry(self, func: Callable, **kwargs):
+        """Await an API call, backing off exponentially on transient errors."""
+        async for attempt in AsyncRetrying(retry=retry_if_exception(self.is_retryable_error), **RETRY_POLICY):
+            with attempt:
+                await self.wait_for_capacity()
+                return await func(**kwargs)
+
+    def validate_batches(
+        self,
+        batches: List[List[Pharmacy]],
+        on_result: Optional[Callable[[int, List[Dict]], None]] = None,
+    ) -> List[List[Dict]]:
+        """Validate many batches concurrently, returning results in batch order.
+
+        At most ``MAX_CONCURRENCY`` requests are in flight at once and, if
+        ``REQUESTS_PER_MINUTE`` is set, no more than that many start per minute.
+        If given, ``on_result(batch_number, validations)`` is called as each
+        batch completes.
+        """
+        results: List[List[Dict]] = [[] for _ in batches]
+
+        def collect(batch_number: int, validations: List[Dict]):
+            results[batch_number] = validations
+            if on_result is not None:
+                on_result(batch_number, validations)
+
+        self.validate_stream(batches, collect)
+        return results
+
+    def validate_stream(
+        self,
+        batches: Iterable[Optional[List[Pharmacy]]],
+        on_result: Callable[[int, List[Dict]], None],
+    ):
+        """Validate batches pulled lazily from an iterable, without keeping the results.
+
+        The next batch is only taken from ``batches`` once a concurrency slot
+        is free, so a producer reading its input in chunks keeps
+        ``MAX_CONCURRENCY`` requests in flight across chunk boundaries. The
+        producer may yield None to wait for a running batch to finish before
+        it is asked again. ``on_result(batch_number, validations)`` is called
+        as each batch completes, numbering batches in the order they were taken.
+        """
+        self.run_async(self._run_all(batches, on_result))
+
+    def run_async(self, coro):
+        """Run a coroutine on the provider's event loop.
+        
+        The loop is reused across calls because pooled connections in
+        http_client are bound to the loop that opened them.
+        """
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+
+    async def warm_up(self):
+        """Issue a cheap request so the first batch skips TCP/TLS setup."""
+        pass
+
+    @functools.cached_property
+    def rate_limiter(self):
+        """Token bucket allowing REQUESTS_PER_MINUTE requests, or None if unlimited.
+        
+        Created once per provider, like the event loop, so the cap holds across
+        validate_batches calls instead of starting each with a full bucket.
+        """
+        if self.requests_per_minute <= 0:
+            return None
+        from aiolimiter import AsyncLimiter
+        return AsyncLimiter(self.requests_per_minute, 60)
+
+    async def _run_all(
+        self,
+        batches: Iterable[Optional[List[Pharmacy]]],
+        on_result: Callable[[int, List[Dict]], None],
+    ):
+        if not self._warmed_up:
+            self._warmed_up = True
+            try:
+                await self.warm_up()
+            except Exception as e:
+                logger.debug(f"Connection warm-up failed: {str(e)}")
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        limiter = self.rate_limiter
+        running = set()
+        failures = []
+
+        async def bounded(batch_number: int, batch: List[Pharmacy]):
+            try:
+                try:
+                    if limiter is not None:
+                        await limiter.acquire()
+                    validations = await self.avalidate_batch_with_ai(batch)
+                finally:
+                    semaphore.release()
+                on_result(batch_number, validations)
+            except Exception as e:
+                failures.append(e)
+
+        # Take a batch only once a slot is free, so the producer reads ahead
+        # no further than the requests it can start
+        batches = iter(batches)
+        batch_number = 0
+        while not failures:
+            await semaphore.acquire()
+            try:
+                batch = next(batches, StopIteration)
+            except Exception as e:
+                # Let the running batches finish before the error is raised
+                failures.append(e)
+                batch = StopIteration
+            if batch is StopIteration:
+                semaphore.release()
+                break
+            if batch is None:
+                # The producer is waiting for results before reading on
+                semaphore.release()
+                if running:
+                    await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            task = asyncio.ensure_future(bounded(batch_number, batch))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            batch_number += 1
+
+        if running:
+            await asyncio.wait(running)
+        if failures:
+            raise failures[0]
+    
+    # Static instructions are kept in the system message so providers can
+    # reuse their cached prefix across batches; only the pharmacy list varies.
+    SYSTEM_PROMPT = _BASE_HEADER + _BASE_FOOTER
+
+    def get_system_prompt(self) -> str:
+        """Return the static instructions sent ahead of every batch."""
+        return self.SYSTEM_PROMPT
+
+    def render_user_message(self, pharmacies_batch: List[Pharmacy]) -> str:
+        """Render the numbered list of pharmacies for one batch."""
+        parts = [PROMPT_HEADER]
+        parts.extend(_fmt_pharmacy(i, p) for i, p in enumerate(pharmacies_batch, 1))
+        return "".join(parts)
+
+    def count_tokens(self, text: str) -> int:
+        """Estimate the number of tokens in text (about 4 characters per token)."""
+        return len(text) // 4 + 1
+
+    def count_prompt_tokens(self) -> int:
+        """Return the token count of the static prompt sent with every batch."""
+        return self.count_tokens(self.get_system_prompt() + self.render_user_message([]))
+
+    @functools.cached_property
+    def prompt_tokens(self) -> int:
+        """Token count of the static prompt, counted once per provider."""
+        return self.count_prompt_tokens()
+
+    def max_output_tokens(self, batch_size: int) -> int:
+        """Return the output token limit for a batch, within the model's completion limit."""
+        max_output = MODEL_MAX_OUTPUT_TOKENS.get(self.model, DEFAULT_MODEL_MAX_OUTPUT_TOKENS)
+        return min(max_output, max(MIN_OUTPUT_TOKENS, OUTPUT_TOKENS_PER_PHARMACY * batch_size))
+
+    def pack_batches(self, pharmacies: List[Pharmacy], max_batch_size: int = 0) -> List[List[int]]:
+        """Split pharmacies into batches of about target_tokens input tokens.
+        
+        Returns the positions of each batch's pharmacies in ``pharmacies``;
+        max_batch_size, if set, caps the pharmacies per batch.
+        """
+        return _pack_batches(
+            pharmacies,
+            self.model,
+            self.count_tokens,
+            self.prompt_tokens,
+            self.target_tokens,
+            max_batch_size
+        )
 
     def parse_response(self, response_text: str, batch_size: int) -> List[Dict]:
-        """Parse AI response and extract validation results."""
+        """Parse the provider's structured JSON response into validation results.
+        
+        Responses are schema-constrained, so invalid JSON is a hard error and
+        is raised to the caller rather than patched over here.
+        """
         try:
-            # Try to find JSON in the response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            
-            if start_idx == -1 or end_idx == 0:
-                raise ValueError("No JSON found in response")
-            
-            json_str = response_text[start_idx:end_idx]
-            result = json.loads(json_str)
-            validations = result.get('validations', [])
-            
-            logger.info(f"Successfully parsed {len(validations)} validations")
-            return validations
-            
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"Failed to parse JSON response: {str(e)}")
+            result = orjson.loads(response_text)
+        except orjson.JSONDecodeError:
             logger.error(f"Response text: {response_text}")
-            
-            # Return default results for this batch
-            return [
-                {
-                    "pharmacy_index": i + 1,
-                    "is_correct": None,
-                    "corrected_states": "",
-                    "confidence": "error",
-                    "reasoning": "Failed to parse AI response"
-                } for i in range(batch_size)
-            ]
+            raise
+        
+        validations = result.get('validations', [])
+        if len(validations) != batch_size:
+            logger.warning(f"Expected {batch_size} validations, got {len(validations)}")
+        
+        logger.info(f"Successfully parsed {len(validations)} validations")
+        return validations
 
 
 class OpenAIProvider(AIProvider):
     """OpenAI provider implementation."""
     
+    PROVIDER_NAME = 'openai'
+    
     def setup_client(self):
         """Set up OpenAI client with API key."""
         try:
@@ -127,7 +749,7 @@ class OpenAIProvider(AIProvider):
             logger.error("OpenAI package not installed. Run: pip install openai")
             raise
         
-        api_key = os.getenv('OPENAI_API_KEY')
+        api_key = self.config.get('OPENAI_API_KEY')
         if not api_key:
             logger.error("OPENAI_API_KEY not found!")
             logger.error("Please set it using one of these methods:")
@@ -135,66 +757,360 @@ class OpenAIProvider(AIProvider):
             logger.error("2. Create .env file with: OPENAI_API_KEY=your-key-here")
             raise ValueError("OpenAI API key not found")
         
-        self.client = openai.OpenAI(api_key=api_key)
-        self.model = os.getenv('OPENAI_MODEL', 'o3-deep-research')
+        # Retries are left to tenacity (with_retry / call_with_retry), so the
+        # SDK's own retry loop is turned off rather than nested inside it
+        self.client = openai.OpenAI(api_key=api_key, max_retries=0)
+        self.aclient = openai.AsyncOpenAI(api_key=api_key, http_client=self.http_client, max_retries=0)
+        self.model = self.config.get('OPENAI_MODEL', 'o3-deep-research')
+        self.stream_responses = self.config.get('STREAM_RESPONSES', 'false').lower() == 'true'
+        # Every request shares the system prompt, so its hash is sent as the
+        # `user` routing hint to keep requests on nodes that cached the prefix
+        self.prefix_key = _prompt_hash(self.model + self.get_system_prompt())
         logger.info("OpenAI client initialized successfully")
 
-    def validate_batch_with_ai(self, batch: List[Dict]) -> List[Dict]:
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the model's tiktoken encoding when available."""
+        encoding = _tiktoken_encoding(self.model)
+        if encoding is None:
+            return super().count_tokens(text)
+        return len(encoding.encode(text))
+
+    async def warm_up(self):
+        """Open a pooled connection to the OpenAI API."""
+        await self.aclient.models.list()
+
+    def is_retryable_error(self, error: BaseException) -> bool:
+        """Retry on rate limits, timeouts and dropped connections.
+        
+        An exhausted quota is also reported as a 429 but will not clear by
+        waiting, so it is not retried.
+        """
+        import openai
+        if isinstance(error, openai.RateLimitError) and error.code == 'insufficient_quota':
+            return False
+        return isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
+
+    def build_request(self, batch: List[Pharmacy]) -> Dict[str, Any]:
+        """Build the chat completion request for a batch."""
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system", 
+                    "content": self.get_system_prompt()
+                },
+                {
+                    "role": "user", 
+                    "content": self.render_user_message(batch)
+                }
+            ],
+            "temperature": 0.1,  # Low temperature for consistency
+            "max_completion_tokens": self.max_output_tokens(len(batch)),
+            "response_format": VALIDATION_RESPONSE_FORMAT,
+            "user": self.prefix_key
+        }
+
+    def parsed_validations(self, message, batch_size: int) -> List[Dict]:
+        """Return the validations of a structured-output message parsed by the SDK."""
+        if message.parsed is None:
+            raise ValueError(f"No structured response: {message.refusal or 'empty content'}")
+        
+        validations = [validation.model_dump() for validation in message.parsed.validations]
+        if len(validations) != batch_size:
+            logger.warning(f"Expected {batch_size} validations, got {len(validations)}")
+        
+        logger.info(f"Successfully parsed {len(validations)} validations")
+        return validations
+
+    def note_rate_limit(self, headers):
+        """Pause new requests until the reset time once no requests remain."""
+        remaining = headers.get('x-ratelimit-remaining-requests')
+        reset = headers.get('x-ratelimit-reset-requests')
+        if remaining is not None and reset is not None and int(remaining) <= 0:
+            self.defer_requests(_parse_reset_duration(reset))
+
+    async def parse_with_rate_limits(self, **request):
+        """Send a structured-output request, tracking the rate-limit headers."""
+        import openai
+        
+        try:
+            raw = await self.aclient.beta.chat.completions.with_raw_response.parse(**request)
+        except openai.RateLimitError as e:
+            self.note_rate_limit(e.response.headers)
+            raise
+        
+        self.note_rate_limit(raw.headers)
+        return raw.parse()
+
+    @with_retry
+    def _do_call(self, request: Dict[str, Any]):
+        """Send a chat completion request, retrying transient errors.
+        
+        The SDK parses the reply into ValidationResponse, so no JSON handling
+        is needed here.
+        """
+        return self.client.beta.chat.completions.parse(**{**request, "response_format": ValidationResponse})
+
+    @cached_validation
+    def validate_batch_with_ai(self, batch: List[Pharmacy]) -> List[Dict]:
         """Validate a batch of pharmacies using OpenAI."""
         
-        prompt = self.create_validation_prompt(batch)
+        request = self.build_request(batch)
         
         try:
             logger.info(f"Validating batch of {len(batch)} pharmacies with OpenAI {self.model}...")
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are a healthcare regulatory expert. Provide accurate, fact-based analysis of pharmacy licensing and operations."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                temperature=0.1,  # Low temperature for consistency
-                max_completion_tokens=4000
-            )
+            response = self._do_call(request)
             
-            response_text = response.choices[0].message.content
-            logger.debug(f"OpenAI response: {response_text}")
+            message = response.choices[0].message
+            logger.debug(f"OpenAI response: {message.content}")
             
-            return self.parse_response(response_text, len(batch))
+            return self.parsed_validations(message, len(batch))
                 
         except Exception as e:
             logger.error(f"OpenAI API error: {str(e)}")
             
             # Return default results for this batch
-            return [
-                {
-                    "pharmacy_index": i + 1,
-                    "is_correct": None,
-                    "corrected_states": "",
-                    "confidence": "error",
-                    "reasoning": f"API error: {str(e)}"
-                } for i in range(len(batch))
-            ]
+            return error_validations(len(batch), f"API error: {str(e)}")
+
+    @cached_validation
+    async def avalidate_batch_with_ai(self, batch: List[Pharmacy]) -> List[Dict]:
+        """Validate a batch of pharmacies using the async OpenAI client."""
+        
+        request = self.build_request(batch)
+        
+        try:
+            logger.info(f"Validating batch of {len(batch)} pharmacies with OpenAI {self.model}...")
+            
+            if self.stream_responses:
+                return await self.stream_validations(request)
+            
+            response = await self.call_with_retry(
+                self.parse_with_rate_limits,
+                **{**request, "response_format": ValidationResponse}
+            )
+            
+            message = response.choices[0].message
+            logger.debug(f"OpenAI response: {message.content}")
+            
+            return self.parsed_validations(message, len(batch))
+                
+        except Exception as e:
+            logger.error(f"OpenAI API error: {str(e)}")
+            return error_validations(len(batch), f"API error: {str(e)}")
+
+    async def stream_validations(self, request: Dict[str, Any]) -> List[Dict]:
+        """Stream a completion and parse each validation as soon as it is complete.
+        
+        Content deltas are fed straight into an incremental ijson parser, so the
+        response is scanned once and never buffered as a whole. If the stream
+        is cut short, the validations completed so far are returned and only
+        the missing pharmacies are left without a verdict.
+        """
+        import ijson
+        import openai
+        
+        completed = ijson.sendable_list()
+        parser = ijson.items_coro(completed, 'validations.item')
+        validations = []
+        
+        stream = await self.call_with_retry(self.aclient.chat.completions.create, stream=True, **request)
+        try:
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                
+                parser.send(chunk.choices[0].delta.content.encode('utf-8'))
+                for validation in completed:
+                    logger.debug(f"OpenAI streamed validation: {validation}")
+                    validations.append(validation)
+                del completed[:]
+            
+            parser.close()
+        except (ijson.IncompleteJSONError, openai.APIError, httpx.HTTPError) as e:
+            validations.extend(completed)
+            if not validations:
+                raise
+            logger.warning(f"Response cut short after {len(validations)} validations: {str(e)}")
+            return validations
+        validations.extend(completed)
+        
+        logger.info(f"Successfully parsed {len(validations)} validations")
+        return validations
+
+
+class OpenAIBatchProvider(OpenAIProvider):
+    """OpenAI provider that submits all batches as one Batch API job.
+
+    Batch API requests are billed at a discount and are not subject to the
+    per-request round trip, at the cost of completing asynchronously
+    (within 24 hours).
+    """
+
+    SUBMITS_ONE_JOB = True
+    BATCH_ENDPOINT = "/v1/chat/completions"
+    FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+    def setup_client(self):
+        """Set up the OpenAI clients; file and job calls keep the SDK's retries."""
+        import openai
+        
+        super().setup_client()
+        # Uploads and job polling are not wrapped in with_retry
+        self.client = self.client.with_options(max_retries=openai.DEFAULT_MAX_RETRIES)
+
+    def validate_batches(
+        self,
+        batches: List[List[Pharmacy]],
+        on_result: Optional[Callable[[int, List[Dict]], None]] = None,
+    ) -> List[List[Dict]]:
+        """Validate all batches with a single OpenAI Batch API job.
+        
+        Pharmacies found in the validation cache are left out of the job, and
+        the job's successful results are cached like those of direct requests.
+        """
+        
+        lookups = [self.lookup_cached(batch) for batch in batches]
+        # Pharmacies still to be validated, by batch number
+        submitted = {
+            batch_number: [batch[i] for i in pending]
+            for batch_number, (batch, (_, _, pending)) in enumerate(zip(batches, lookups))
+            if pending
+        }
+        fresh = {number: error_validations(len(batch), "No result returned by Batch API") for number, batch in submitted.items()}
+        
+        try:
+            if submitted:
+                input_file_id = self.upload_batch_requests(submitted)
+                job = self.client.batches.create(
+                    input_file_id=input_file_id,
+                    endpoint=self.BATCH_ENDPOINT,
+                    completion_window="24h"
+                )
+                logger.info(f"Submitted Batch API job {job.id} with {len(submitted)} requests")
+                
+                job = self.wait_for_batch_job(job.id)
+                
+                if job.status != "completed":
+                    logger.error(f"Batch API job {job.id} ended with status '{job.status}'")
+                    fresh = {number: error_validations(len(batch), f"Batch API job {job.status}") for number, batch in submitted.items()}
+                
+                if job.output_file_id:
+                    self.collect_batch_output(job.output_file_id, submitted, fresh)
+                if job.error_file_id:
+                    self.collect_batch_output(job.error_file_id, submitted, fresh)
+                
+        except Exception as e:
+            logger.error(f"OpenAI Batch API error: {str(e)}")
+            fresh = {number: error_validations(len(batch), f"API error: {str(e)}") for number, batch in submitted.items()}
+        
+        results = []
+        for batch_number, (keys, cached, pending) in enumerate(lookups):
+            if pending:
+                self.store_validations(keys, cached, pending, fresh[batch_number])
+            results.append([result for result in cached if result is not None])
+        
+        if on_result is not None:
+            for batch_number, validations in enumerate(results):
+                on_result(batch_number, validations)
+        
+        return results
+
+    def validate_stream(
+        self,
+        batches: Iterable[Optional[List[Pharmacy]]],
+        on_result: Callable[[int, List[Dict]], None],
+    ):
+        """Collect every batch, then validate them with a single Batch API job."""
+        self.validate_batches([batch for batch in batches if batch is not None], on_result)
+
+    def upload_batch_requests(self, batches: Dict[int, List[Pharmacy]]) -> str:
+        """Write one chat completion request per numbered batch to JSONL and upload it."""
+        
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+            for batch_number, batch in batches.items():
+                f.write(json.dumps({
+                    "custom_id": f"batch_{batch_number}",
+                    "method": "POST",
+                    "url": self.BATCH_ENDPOINT,
+                    "body": self.build_request(batch)
+                }) + "\n")
+            requests_path = f.name
+        
+        try:
+            with open(requests_path, 'rb') as f:
+                uploaded = self.client.files.create(file=f, purpose="batch")
+        finally:
+            os.remove(requests_path)
+        
+        return uploaded.id
+
+    def wait_for_batch_job(self, job_id: str):
+        """Poll a Batch API job with exponential sleep until it finishes."""
+        
+        delay = 10
+        while True:
+            job = self.client.batches.retrieve(job_id)
+            if job.status in self.FINAL_STATUSES:
+                return job
+            
+            counts = job.request_counts
+            done = f"{counts.completed}/{counts.total}" if counts else "?"
+            logger.info(f"Batch API job {job_id} is {job.status} ({done} requests done), checking again in {delay}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 300)
+
+    def collect_batch_output(self, file_id: str, batches: Dict[int, List[Pharmacy]], results: Dict[int, List[Dict]]):
+        """Map Batch API output lines back to their batches by custom_id.
+        
+        A line that cannot be read or parsed only turns its own batch into
+        error rows; the other batches keep their results.
+        """
+        
+        content = self.client.files.content(file_id).text
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            
+            try:
+                record = orjson.loads(line)
+                batch_number = int(record["custom_id"].rsplit("_", 1)[1])
+                batch_size = len(batches[batch_number])
+            except Exception as e:
+                logger.error(f"Unreadable Batch API output line skipped: {str(e)}")
+                continue
+            
+            response = record.get("response") or {}
+            
+            if response.get("status_code") == 200:
+                try:
+                    response_text = response["body"]["choices"][0]["message"]["content"]
+                    logger.debug(f"OpenAI batch response {record['custom_id']}: {response_text}")
+                    results[batch_number] = self.parse_response(response_text, batch_size)
+                except Exception as e:
+                    logger.error(f"Batch API response {record['custom_id']} could not be parsed: {str(e)}")
+                    results[batch_number] = error_validations(batch_size, f"Parse error: {str(e)}")
+            else:
+                error = record.get("error") or response.get("body", {}).get("error")
+                logger.error(f"Batch API request {record['custom_id']} failed: {error}")
+                results[batch_number] = error_validations(batch_size, f"API error: {error}")
 
 
 class GoogleProvider(AIProvider):
     """Google Gemini provider implementation with search and URL grounding."""
     
+    PROVIDER_NAME = 'google'
+    
     def setup_client(self):
         """Set up Google Gemini client with API key."""
         try:
             from google import genai
+            from google.genai import types
         except ImportError:
             logger.error("Google GenAI package not installed. Run: pip install google-genai")
             raise
         
-        api_key = os.getenv('GOOGLE_API_KEY')
+        api_key = self.config.get('GOOGLE_API_KEY')
         if not api_key:
             logger.error("GOOGLE_API_KEY not found!")
             logger.error("Please set it using one of these methods:")
@@ -202,87 +1118,132 @@ class GoogleProvider(AIProvider):
             logger.error("2. Create .env file with: GOOGLE_API_KEY=your-key-here")
             raise ValueError("Google API key not found")
         
-        self.client = genai.Client(api_key=api_key)
-        self.model = os.getenv('GOOGLE_MODEL', 'gemini-2.5-pro')
-        self.enable_search = os.getenv('ENABLE_SEARCH_GROUNDING', 'true').lower() == 'true'
-        self.enable_url_grounding = os.getenv('ENABLE_URL_GROUNDING', 'true').lower() == 'true'
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(httpx_async_client=self.http_client)
+        )
+        self.model = self.config.get('GOOGLE_MODEL', 'gemini-2.5-pro')
+        self.enable_search = self.config.get('ENABLE_SEARCH_GROUNDING', 'true').lower() == 'true'
+        self.enable_url_grounding = self.config.get('ENABLE_URL_GROUNDING', 'true').lower() == 'true'
         
         logger.info(f"Google Gemini client initialized successfully")
         logger.info(f"Model: {self.model}")
         logger.info(f"Search grounding: {self.enable_search}")
         logger.info(f"URL grounding: {self.enable_url_grounding}")
 
-    def create_google_validation_prompt(self, pharmacies_batch: List[Dict]) -> str:
-        """Create a Google-optimized prompt with search and URL grounding hints."""
+    def get_system_prompt(self) -> str:
+        """Return the base instructions with search and URL grounding hints."""
+        return self.SYSTEM_PROMPT + _google_enhancement(self.enable_search, self.enable_url_grounding)
+
+    def count_prompt_tokens(self) -> int:
+        """Count the static prompt tokens with the Gemini count_tokens API.
         
-        # Start with base prompt
-        prompt = self.create_validation_prompt(pharmacies_batch)
+        Per-pharmacy lines keep the local estimate; counting each one remotely
+        would cost a round trip per row.
+        """
+        try:
+            response = self.client.models.count_tokens(
+                model=self.model,
+                contents=self.get_system_prompt() + self.render_user_message([])
+            )
+            return response.total_tokens
+        except Exception as e:
+            logger.debug(f"Token count request failed, using estimate: {str(e)}")
+            return super().count_prompt_tokens()
+
+    async def warm_up(self):
+        """Open a pooled connection to the Gemini API."""
+        await self.client.aio.models.get(model=self.model)
+
+    def is_retryable_error(self, error: BaseException) -> bool:
+        """Retry on rate limits (429) and transient server errors."""
+        from google.genai import errors
+        return isinstance(error, errors.APIError) and error.code in (429, 500, 503, 504)
+
+    def get_tools(self) -> Optional[List[Dict]]:
+        """Return the grounding tools enabled for this provider."""
+        if self.enable_search:
+            return [{"google_search": {}}]
+        return None
+
+    def build_request(self, batch: List[Pharmacy]) -> Dict[str, Any]:
+        """Build the generate_content request for a batch."""
         
-        # Add Google-specific enhancements
-        if self.enable_search or self.enable_url_grounding:
-            search_enhancement = """
+        config = {
+            "temperature": 0.1,
+            "max_output_tokens": self.max_output_tokens(len(batch))
+        }
+        
+        # Gemini cannot combine JSON mode with search grounding tools
+        if not self.get_tools():
+            config["response_mime_type"] = "application/json"
+            config["response_schema"] = ValidationResponse
+        
+        # The static instructions lead every request, so Gemini's implicit
+        # prefix caching can reuse them; they are below the minimum size of
+        # an explicit cache
+        config["system_instruction"] = self.get_system_prompt()
+        config["tools"] = self.get_tools()
+        
+        return {
+            "model": self.model,
+            "contents": self.render_user_message(batch),
+            "config": config
+        }
 
-SEARCH STRATEGY (Use Google Search to find current information):
-"""
-            
-            if self.enable_search:
-                search_enhancement += """
-- Search for "[pharmacy name] licensing states" to find current operational scope
-- Search for "[pharmacy name] pharmacy board license" for official records
-- Search for "mail order pharmacy licensing [state name]" for state-specific requirements
-"""
-            
-            if self.enable_url_grounding:
-                search_enhancement += """
-- Reference specific state pharmacy board websites:
-  * "[state].gov pharmacy board" or "[state] board of pharmacy"
-  * NABP (National Association of Boards of Pharmacy) database
-  * State-specific pharmacy licensing verification portals
-"""
-                
-                # Add specific URLs for major states
-                search_enhancement += """
-- Key regulatory websites to check:
-  * https://www.nabp.pharmacy/ (National database)
-  * State pharmacy board websites for license verification
-  * FDA registered mail-order pharmacy databases
-"""
+    def parse_response(self, response_text: str, batch_size: int) -> List[Dict]:
+        """Parse a Gemini response, extracting the JSON object from grounded answers.
+        
+        With search grounding JSON mode is off, so the answer may wrap the
+        object in a markdown fence or surrounding prose; the text from the
+        first '{' to the last '}' is parsed. JSON-mode answers are parsed as is.
+        """
         
-            prompt += search_enhancement
+        response_text = response_text.strip()
+        if self.get_tools():
+            start, end = response_text.find('{'), response_text.rfind('}')
+            if start != -1 and end > start:
+                response_text = response_text[start:end + 1]
         
-        return prompt
+        return super().parse_response(response_text, batch_size)
 
-    def validate_batch_with_ai(self, batch: List[Dict]) -> List[Dict]:
+    @with_retry
+    def _do_call(self, request: Dict[str, Any]):
+        """Send a generate_content request, retrying transient errors."""
+        return self.client.models.generate_content(**request)
+
+    @cached_validation
+    def validate_batch_with_ai(self, batch: List[Pharmacy]) -> List[Dict]:
         """Validate a batch of pharmacies using Google Gemini with search grounding."""
         
-        prompt = self.create_google_validation_prompt(batch)
+        request = self.build_request(batch)
         
         try:
             logger.info(f"Validating batch of {len(batch)} pharmacies with Google {self.model}...")
             
-            # Prepare tools for search and URL grounding
-            tools = []
+            response = self._do_call(request)
             
-            if self.enable_search:
-                tools.append("google_search")
+            response_text = response.text
+            logger.debug(f"Google Gemini response: {response_text}")
             
-            # Create the request using the correct API structure
-            generation_config = {
-                "temperature": 0.1,
-                "max_output_tokens": 4000
-            }
+            return self.parse_response(response_text, len(batch))
+                
+        except Exception as e:
+            logger.error(f"Google Gemini API error: {str(e)}")
             
-            # Add tools if enabled  
-            tools_config = None
-            if tools:
-                tools_config = [{"google_search": {}}] if "google_search" in tools else None
+            # Return default results for this batch
+            return error_validations(len(batch), f"API error: {str(e)}")
+
+    @cached_validation
+    async def avalidate_batch_with_ai(self, batch: List[Pharmacy]) -> List[Dict]:
+        """Validate a batch of pharmacies using the async Gemini client."""
+        
+        request = self.build_request(batch)
+        
+        try:
+            logger.info(f"Validating batch of {len(batch)} pharmacies with Google {self.model}...")
             
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                generation_config=generation_config,
-                tools=tools_config
-            )
+            response = await self.call_with_retry(self.client.aio.models.generate_content, **request)
             
             response_text = response.text
             logger.debug(f"Google Gemini response: {response_text}")
@@ -291,30 +1252,44 @@ SEARCH STRATEGY (Use Google Search to find current information):
                 
         except Exception as e:
             logger.error(f"Google Gemini API error: {str(e)}")
-            
-            # Return default results for this batch
-            return [
-                {
-                    "pharmacy_index": i + 1,
-                    "is_correct": None,
-                    "corrected_states": "",
-                    "confidence": "error",
-                    "reasoning": f"API error: {str(e)}"
-                } for i in range(len(batch))
-            ]
+            return error_validations(len(batch), f"API error: {str(e)}")
 
 
-def get_ai_provider(provider_name: Optional[str] = None) -> AIProvider:
-    """Factory function to get the appropriate AI provider."""
+def get_ai_provider(provider_name: Optional[str] = None, config: Optional[Mapping[str, str]] = None) -> AIProvider:
+    """Return the process-wide AI provider for a name (default: AI_PROVIDER).
+    
+    Providers are created once and shared, so their SDK clients and pooled
+    connections are reused by every caller. Settings come from ``config``
+    (default: env_config()) when the provider is first created.
+    """
+    
+    if config is None:
+        config = env_config()
     
     if provider_name is None:
-        provider_name = os.getenv('AI_PROVIDER', 'openai').lower()
+        provider_name = config.get('AI_PROVIDER', 'openai').lower()
+    use_batch_api = config.get('USE_BATCH_API', 'false').lower() == 'true'
     
+    provider = _PROVIDERS.get((provider_name, use_batch_api))
+    if provider is None:
+        provider = _create_provider(provider_name, use_batch_api, config)
+        _PROVIDERS[(provider_name, use_batch_api)] = provider
+    return provider
+
+
+# Providers created so far, keyed by name and Batch API mode
+_PROVIDERS: Dict[tuple, AIProvider] = {}
+
+
+def _create_provider(provider_name: str, use_batch_api: bool, config: Mapping[str, str]) -> AIProvider:
+    """Construct a provider; failures are raised and not cached."""
     if provider_name == 'openai':
-        return OpenAIProvider()
+        if use_batch_api:
+            return OpenAIBatchProvider(config)
+        return OpenAIProvider(config)
     elif provider_name == 'google':
-        return GoogleProvider()
+        return GoogleProvider(config)
     else:
         logger.error(f"Unknown AI provider: {provider_name}")
         logger.error("Supported providers: 'openai', 'google'")
-        raise ValueError(f"Unknown AI provider: {provider_name}")
\ No newline at end of file
+        raise ValueError(f"Unknown AI provider: {provider_name}")
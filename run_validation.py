@@ -2,34 +2,69 @@
 """
 Simple runner script for pharmacy validation.
 This script handles the complete workflow with error checking.
+Only dependency installation runs in a subprocess; the setup test and
+the validation itself run in this process.
 """
 
+import csv
+import importlib
 import subprocess
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 
-def run_command(command, description):
-    """Run a command and handle errors."""
+def run_command(argv, description):
+    """Run a program (argv list, no shell) with inherited stdio so its output is shown live."""
     print(f"\n{description}...")
     print("-" * 50)
+    sys.stdout.flush()
     
     try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        
-        if result.stdout:
-            print(result.stdout)
-        
-        if result.stderr and result.returncode != 0:
-            print(f"Error: {result.stderr}")
-            return False
-            
+        result = subprocess.run(argv, text=True, check=False)
         return result.returncode == 0
         
     except Exception as e:
         print(f"Failed to run command: {str(e)}")
         return False
 
+def install_dependencies():
+    """Install dependencies with UV, falling back to pip."""
+    print("Installing dependencies...")
+    
+    # Try UV first (if available), then fall back to pip
+    uv_success = run_command(["uv", "sync"], "Installing requirements with UV")
+    if not uv_success:
+        print("UV not available, trying pip...")
+        if not run_command([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"], "Installing requirements with pip"):
+            print("Failed to install dependencies. Please install manually:")
+            print("With UV: uv sync")
+            print("With pip: pip install openai google-genai pandas tqdm python-dotenv")
+            return False
+    
+    return True
+
+def check_csv_file():
+    """Check that the configured CSV exists and has the required column."""
+    csv_directory = os.getenv('CSV_DIRECTORY', 'CSVs')
+    csv_filename = os.path.join(csv_directory, os.getenv('CSV_FILENAME', 'Mail order active EPCS pharmacies w states - Master 31 Jul 2025.csv'))
+    
+    if not os.path.exists(csv_filename):
+        print(f"❌ CSV file '{csv_filename}' not found!")
+        print("You can configure the CSV location in .env file (CSV_DIRECTORY, CSV_FILENAME)")
+        return False
+    
+    # Only the header row is needed, so this works before pandas is installed
+    with open(csv_filename, newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f), [])
+    
+    if 'Operates in states' not in header:
+        print("❌ Required column 'Operates in states' not found in CSV")
+        print(f"Available columns: {header}")
+        return False
+    
+    return True
+
 def main():
     """Main execution workflow."""
     print("Pharmacy States of Operation Validation")
@@ -57,22 +92,26 @@ def main():
         print("\nThen run this script again.")
         return 1
     
-    # Install dependencies
-    print("Installing dependencies...")
+    # Install dependencies while checking the CSV file
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        install = executor.submit(install_dependencies)
+        csv_check = executor.submit(check_csv_file)
+        wait([install, csv_check])
     
-    # Try UV first (if available), then fall back to pip
-    uv_success = run_command("uv sync", "Installing requirements with UV")
-    if not uv_success:
-        print("UV not available, trying pip...")
-        if not run_command("pip install -r requirements.txt", "Installing requirements with pip"):
-            print("Failed to install dependencies. Please install manually:")
-            print("With UV: uv sync")
-            print("With pip: pip install openai google-genai pandas tqdm python-dotenv")
-            return 1
+    if not install.result():
+        return 1
+    
+    if not csv_check.result():
+        print("CSV check failed. Please check the errors above.")
+        return 1
     
-    # Run setup test
+    # Modules installed above must be importable from this process
+    importlib.invalidate_caches()
+    
+    # Run setup test in-process (no second interpreter or pandas import)
     print("\nRunning setup verification...")
-    if not run_command("python test_setup.py", "Testing setup"):
+    import test_setup
+    if test_setup.main() != 0:
         print("Setup test failed. Please check the errors above.")
         return 1
     
@@ -80,13 +119,17 @@ def main():
     print("\nStarting validation process...")
     print("This may take several minutes depending on your dataset size.")
     
-    if not run_command("python validate_pharmacy_states.py", "Running validation"):
-        print("Validation failed. Check the log files for details.")
-        return 1
+    import validate_pharmacy_states
+    try:
+        validate_pharmacy_states.main()
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            print("Validation failed. Check the log files for details.")
+            return 1
     
     print("\n" + "=" * 50)
     print("✅ Validation completed successfully!")
-    print("Check the output CSV file and log files for results.")
+    print("Check the output Parquet file and log files for results.")
     
     return 0
 
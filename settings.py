@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Settings shared by the validation scripts.
+
+This module only depends on the standard library at import time, so the
+scripts can read their configuration before pandas or a provider SDK is
+loaded (or checked for, in test_setup.py).
+"""
+
+import functools
+import os
+from typing import Dict
+
+
+@functools.lru_cache(maxsize=1)
+def env_config() -> Dict[str, str]:
+    """Return the .env settings overlaid with the process environment.
+    
+    The .env file is parsed once per process and os.environ is left untouched.
+    """
+    from dotenv import dotenv_values
+    return {**dotenv_values(), **os.environ}
@@ -7,7 +7,7 @@ Run this to test your provider configuration without processing a full CSV.
 import os
 import sys
 from dotenv import load_dotenv
-from providers import get_ai_provider
+from providers import get_ai_provider, Pharmacy
 
 def test_provider():
     """Test the configured AI provider with a sample pharmacy."""
@@ -15,15 +15,15 @@ def test_provider():
     load_dotenv()
     
     # Sample pharmacy data for testing
-    test_pharmacy = [{
-        'StoreName': 'Test Pharmacy',
-        'Address1': '123 Main St',
-        'City': 'Anytown',
-        'State': 'CA',
-        'ZipCode': '90210',
-        'Operates in states': 'CA, NV, AZ',
-        'NCPDPID': '1234567'
-    }]
+    test_pharmacy = [Pharmacy(
+        StoreName='Test Pharmacy',
+        Address1='123 Main St',
+        City='Anytown',
+        State='CA',
+        ZipCode='90210',
+        OperatesInStates='CA, NV, AZ',
+        NCPDPID='1234567'
+    )]
     
     try:
         # Get configured provider
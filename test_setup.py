@@ -7,7 +7,8 @@ Supports both OpenAI and Google Gemini providers.
 
 import sys
 import os
-from dotenv import load_dotenv
+
+from settings import env_config
 
 def test_dependencies():
     """Test if all required dependencies are installed."""
@@ -27,9 +28,22 @@ def test_dependencies():
         print("✗ tqdm not found. Run: pip install tqdm")
         return False
     
+    try:
+        import pyarrow.parquet
+        print("✓ pyarrow imported successfully")
+    except ImportError:
+        print("✗ pyarrow not found. Run: pip install pyarrow")
+        return False
+    
+    try:
+        import dotenv
+        print("✓ python-dotenv imported successfully")
+    except ImportError:
+        print("✗ python-dotenv not found. Run: pip install python-dotenv")
+        return False
+    
     # Test AI provider-specific dependencies
-    load_dotenv()
-    ai_provider = os.getenv('AI_PROVIDER', 'openai').lower()
+    ai_provider = env_config().get('AI_PROVIDER', 'openai').lower()
     
     if ai_provider == 'openai':
         try:
@@ -52,15 +66,13 @@ def test_dependencies():
 def test_api_key():
     """Test if AI provider API key is set."""
     print("\nTesting API configuration...")
+    config = env_config()
     
-    # Load environment variables from .env file
-    load_dotenv()
-    
-    ai_provider = os.getenv('AI_PROVIDER', 'openai').lower()
+    ai_provider = config.get('AI_PROVIDER', 'openai').lower()
     print(f"✓ AI Provider: {ai_provider}")
     
     if ai_provider == 'openai':
-        api_key = os.getenv('OPENAI_API_KEY')
+        api_key = config.get('OPENAI_API_KEY')
         if not api_key:
             env_file_exists = os.path.exists('.env')
             print("✗ OPENAI_API_KEY not found")
@@ -78,7 +90,7 @@ def test_api_key():
         print("✓ OPENAI_API_KEY is set")
         
         # Check model configuration
-        model = os.getenv('OPENAI_MODEL', 'o3-deep-research')
+        model = config.get('OPENAI_MODEL', 'o3-deep-research')
         print(f"✓ Configured model: {model}")
         
         if model == 'o3-deep-research':
@@ -86,7 +98,7 @@ def test_api_key():
             print("   If you get access errors, try setting OPENAI_MODEL=gpt-4o in .env")
     
     elif ai_provider == 'google':
-        api_key = os.getenv('GOOGLE_API_KEY')
+        api_key = config.get('GOOGLE_API_KEY')
         if not api_key:
             env_file_exists = os.path.exists('.env')
             print("✗ GOOGLE_API_KEY not found")
@@ -105,12 +117,12 @@ def test_api_key():
         print("✓ GOOGLE_API_KEY is set")
         
         # Check model configuration
-        model = os.getenv('GOOGLE_MODEL', 'gemini-2.5-pro')
+        model = config.get('GOOGLE_MODEL', 'gemini-2.5-pro')
         print(f"✓ Configured model: {model}")
         
         # Check Google-specific features
-        search_grounding = os.getenv('ENABLE_SEARCH_GROUNDING', 'true').lower() == 'true'
-        url_grounding = os.getenv('ENABLE_URL_GROUNDING', 'true').lower() == 'true'
+        search_grounding = config.get('ENABLE_SEARCH_GROUNDING', 'true').lower() == 'true'
+        url_grounding = config.get('ENABLE_URL_GROUNDING', 'true').lower() == 'true'
         print(f"✓ Search grounding: {search_grounding}")
         print(f"✓ URL grounding: {url_grounding}")
     
@@ -121,14 +133,38 @@ def test_api_key():
     
     return True
 
+def read_csv_summary(csv_filename):
+    """Return the column names and row count of a CSV file.
+    
+    Uses pyarrow's streaming reader so rows are counted without building a
+    DataFrame; falls back to pandas if pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        import pandas as pd
+        df = pd.read_csv(csv_filename)
+        return list(df.columns), len(df)
+    
+    columns = pacsv.open_csv(csv_filename).schema.names
+    
+    # Read every column as text so type inference on the first block
+    # cannot fail on later rows
+    reader = pacsv.open_csv(
+        csv_filename,
+        convert_options=pacsv.ConvertOptions(column_types={name: pa.string() for name in columns})
+    )
+    row_count = sum(batch.num_rows for batch in reader)
+    return columns, row_count
+
 def test_csv_file():
     """Test if CSV file exists."""
     print("\nTesting CSV file...")
+    config = env_config()
     
-    # Load environment variables to get CSV configuration
-    load_dotenv()
-    csv_directory = os.getenv('CSV_DIRECTORY', 'CSVs')
-    csv_filename = os.path.join(csv_directory, os.getenv('CSV_FILENAME', 'Mail order active EPCS pharmacies w states - Master 31 Jul 2025.csv'))
+    csv_directory = config.get('CSV_DIRECTORY', 'CSVs')
+    csv_filename = os.path.join(csv_directory, config.get('CSV_FILENAME', 'Mail order active EPCS pharmacies w states - Master 31 Jul 2025.csv'))
     
     if not os.path.exists(csv_filename):
         print(f"✗ CSV file '{csv_filename}' not found")
@@ -140,13 +176,12 @@ def test_csv_file():
         return False
     
     try:
-        import pandas as pd
-        df = pd.read_csv(csv_filename)
-        print(f"✓ CSV file loaded successfully ({len(df)} rows)")
+        columns, row_count = read_csv_summary(csv_filename)
+        print(f"✓ CSV file loaded successfully ({row_count} rows)")
         
-        if 'Operates in states' not in df.columns:
+        if 'Operates in states' not in columns:
             print("✗ Required column 'Operates in states' not found")
-            print(f"Available columns: {list(df.columns)}")
+            print(f"Available columns: {columns}")
             return False
         
         print("✓ Required column 'Operates in states' found")
@@ -162,6 +197,12 @@ def main():
     print("=" * 50)
     
     deps_ok = test_dependencies()
+    if not deps_ok:
+        # The remaining checks read the configuration with python-dotenv
+        print("\n" + "=" * 50)
+        print("✗ Some tests failed. Please fix the issues above.")
+        return 1
+    
     api_ok = test_api_key()
     csv_ok = test_csv_file()
     
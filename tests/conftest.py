@@ -0,0 +1,31 @@
+import importlib
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def vps(tmp_path, monkeypatch):
+    """The validate_pharmacy_states module, run from a temporary directory.
+    
+    The module writes its log file to the working directory when imported.
+    """
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module('validate_pharmacy_states')
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """Write pharmacy rows (store name, listed states) to an input CSV."""
+    
+    def write(rows, name='input.csv'):
+        path = tmp_path / name
+        pd.DataFrame({
+            'StoreName': [store for store, _ in rows],
+            'Address1': ['1 Main St'] * len(rows),
+            'Operates in states': [states for _, states in rows],
+            'NCPDPID': [f"{i:07d}" for i in range(len(rows))],
+        }).to_csv(path, index=False)
+        return str(path)
+    
+    return write
@@ -0,0 +1,58 @@
+"""Offline stand-ins for the AI providers used by the tests."""
+
+import asyncio
+from typing import Dict, List
+
+from providers import AIProvider, Pharmacy, cached_validation
+
+
+class FakeProvider(AIProvider):
+    """Provider answering from the pharmacy fields, without network calls.
+    
+    A pharmacy is correct unless its listed states are 'XX'. Every batch
+    sent to the "API" is recorded in ``calls``; ``on_call(provider, batch)``
+    runs before each answer. Async answers wait ``delay`` seconds, or
+    ``delay(batch)`` if it is callable, so batches can overlap or finish
+    out of order; ``peak_in_flight`` is the most that overlapped.
+    """
+    
+    PROVIDER_NAME = 'fake'
+    
+    def __init__(self, config: Dict[str, str] = None, on_call=None, delay=0):
+        self.calls: List[List[Pharmacy]] = []
+        self.on_call = on_call
+        self.delay = delay
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        super().__init__({'VALIDATION_CACHE': '', **(config or {})})
+    
+    def setup_client(self):
+        self.model = 'gpt-4o'
+    
+    def answer(self, batch: List[Pharmacy]) -> List[Dict]:
+        self.calls.append(list(batch))
+        if self.on_call is not None:
+            self.on_call(self, batch)
+        return [
+            {
+                "pharmacy_index": i,
+                "is_correct": pharmacy.OperatesInStates != 'XX',
+                "corrected_states": "",
+                "confidence": "high",
+                "reasoning": f"checked {pharmacy.StoreName}"
+            } for i, pharmacy in enumerate(batch, 1)
+        ]
+    
+    @cached_validation
+    def validate_batch_with_ai(self, batch: List[Pharmacy]) -> List[Dict]:
+        return self.answer(batch)
+    
+    @cached_validation
+    async def avalidate_batch_with_ai(self, batch: List[Pharmacy]) -> List[Dict]:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay(batch) if callable(self.delay) else self.delay)
+        finally:
+            self.in_flight -= 1
+        return self.answer(batch)
@@ -0,0 +1,90 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from providers import OpenAIBatchProvider, Pharmacy
+
+
+def rows_of(request):
+    """Return the tab-separated pharmacy rows of a Batch API request."""
+    return [row.split('\t') for row in request['body']['messages'][1]['content'].splitlines()[2:]]
+
+
+class FakeBatchAPI:
+    """Stand-in for the OpenAI files and batches endpoints used by the Batch API provider."""
+    
+    def __init__(self):
+        self.jobs = []
+        self.files = SimpleNamespace(create=self.upload, content=self.content)
+        self.batches = SimpleNamespace(create=self.create_job, retrieve=self.retrieve_job)
+    
+    def upload(self, file, purpose):
+        self.jobs.append([json.loads(line) for line in file.read().splitlines()])
+        return SimpleNamespace(id=str(len(self.jobs) - 1))
+    
+    def create_job(self, input_file_id, endpoint, completion_window):
+        return SimpleNamespace(id=input_file_id)
+    
+    def retrieve_job(self, job_id):
+        return SimpleNamespace(status='completed', output_file_id=job_id, error_file_id=None)
+    
+    def content(self, file_id):
+        lines = []
+        for request in self.jobs[int(file_id)]:
+            validations = [
+                {
+                    "pharmacy_index": int(index),
+                    "is_correct": True,
+                    "corrected_states": "",
+                    "confidence": "high",
+                    "reasoning": f"checked {name}"
+                } for index, name, *_ in rows_of(request)
+            ]
+            body = {"choices": [{"message": {"content": json.dumps({"validations": validations})}}]}
+            lines.append(json.dumps({"custom_id": request['custom_id'], "response": {"status_code": 200, "body": body}}))
+        return SimpleNamespace(text="\n".join(lines))
+
+
+@pytest.fixture
+def make_provider(tmp_path):
+    api = FakeBatchAPI()
+    
+    def make():
+        provider = OpenAIBatchProvider({
+            'OPENAI_API_KEY': 'sk-test',
+            'OPENAI_MODEL': 'gpt-4o',
+            'VALIDATION_CACHE': str(tmp_path / 'cache.sqlite'),
+        })
+        provider.client = api
+        return provider
+    
+    return api, make
+
+
+def submitted_names(job):
+    return [[name for _, name, *_ in rows_of(request)] for request in job]
+
+
+def test_cached_pharmacies_are_left_out_of_the_job(make_provider):
+    api, make = make_provider
+    a, b, c = (Pharmacy(StoreName=name) for name in 'abc')
+    make().validate_batches([[a, b]])
+    
+    results = make().validate_batches([[b, c], [a]])
+    
+    assert submitted_names(api.jobs[1]) == [['c']]
+    assert [[(v['pharmacy_index'], v['reasoning']) for v in batch] for batch in results] == [
+        [(1, 'checked b'), (2, 'checked c')],
+        [(1, 'checked a')],
+    ]
+
+
+def test_no_job_is_submitted_when_everything_is_cached(make_provider):
+    api, make = make_provider
+    make().validate_batches([[Pharmacy(StoreName='a')]])
+    
+    results = make().validate_batches([[Pharmacy(StoreName='a')]])
+    
+    assert len(api.jobs) == 1
+    assert [v['reasoning'] for v in results[0]] == ['checked a']
@@ -0,0 +1,75 @@
+from providers import Pharmacy
+
+from fakes import FakeProvider
+
+
+def names(batches):
+    return [[pharmacy.StoreName for pharmacy in batch] for batch in batches]
+
+
+def test_concurrent_batches_share_in_flight_pharmacies():
+    a, b, c = (Pharmacy(StoreName=name) for name in 'abc')
+    provider = FakeProvider(delay=0.05)
+    
+    results = provider.validate_batches([[a, b], [a, c]])
+    
+    # 'a' is only sent with the first batch; the second batch reuses its result
+    assert sorted(names(provider.calls)) == [['a', 'b'], ['c']]
+    assert [v['reasoning'] for v in results[1]] == ['checked a', 'checked c']
+    assert [v['pharmacy_index'] for v in results[1]] == [1, 2]
+
+
+def test_cached_pharmacies_skip_the_api(tmp_path):
+    config = {'VALIDATION_CACHE': str(tmp_path / 'cache.sqlite')}
+    a, b = Pharmacy(StoreName='a'), Pharmacy(StoreName='b')
+    FakeProvider(config).validate_batch_with_ai([a])
+    
+    provider = FakeProvider(config)
+    results = provider.validate_batch_with_ai([b, a])
+    
+    assert names(provider.calls) == [['b']]
+    assert [(v['pharmacy_index'], v['reasoning']) for v in results] == [(1, 'checked b'), (2, 'checked a')]
+
+
+def test_equivalent_state_listings_share_a_cache_entry(tmp_path):
+    config = {'VALIDATION_CACHE': str(tmp_path / 'cache.sqlite')}
+    FakeProvider(config).validate_batch_with_ai([Pharmacy(StoreName='a', OperatesInStates='CA, NV')])
+    
+    provider = FakeProvider(config)
+    provider.validate_batch_with_ai([Pharmacy(StoreName='a', OperatesInStates='nv,ca')])
+    
+    assert provider.calls == []
+
+
+def test_cache_is_not_shared_across_models(tmp_path):
+    config = {'VALIDATION_CACHE': str(tmp_path / 'cache.sqlite')}
+    FakeProvider(config).validate_batch_with_ai([Pharmacy(StoreName='a')])
+    
+    provider = FakeProvider(config)
+    provider.model = 'gpt-4.1'
+    provider.validate_batch_with_ai([Pharmacy(StoreName='a')])
+    
+    assert names(provider.calls) == [['a']]
+
+
+def test_failed_validations_are_not_cached(tmp_path):
+    config = {'VALIDATION_CACHE': str(tmp_path / 'cache.sqlite')}
+    failing = FakeProvider(config)
+    failing.answer = lambda batch: [{'pharmacy_index': 1, 'is_correct': None, 'confidence': 'error'}]
+    failing.validate_batch_with_ai([Pharmacy(StoreName='a')])
+    
+    provider = FakeProvider(config)
+    provider.validate_batch_with_ai([Pharmacy(StoreName='a')])
+    
+    assert names(provider.calls) == [['a']]
+
+
+def test_expired_entries_are_validated_again(tmp_path):
+    config = {'VALIDATION_CACHE': str(tmp_path / 'cache.sqlite')}
+    FakeProvider(config).validate_batch_with_ai([Pharmacy(StoreName='a')])
+    
+    provider = FakeProvider(config)
+    provider.cache.conn.execute("UPDATE validations SET created = created - 31 * 86400")
+    provider.validate_batch_with_ai([Pharmacy(StoreName='a')])
+    
+    assert names(provider.calls) == [['a']]
@@ -0,0 +1,51 @@
+from providers import (
+    MODEL_MAX_OUTPUT_TOKENS,
+    OUTPUT_TOKENS_PER_PHARMACY,
+    Pharmacy,
+    _fmt_pharmacy,
+    _pack_batches,
+)
+
+
+def estimate(text):
+    return len(text) // 4 + 1
+
+
+def pharmacies(count, name='Pharmacy'):
+    return [Pharmacy(StoreName=f'{name} {i}', OperatesInStates='CA, NV') for i in range(count)]
+
+
+def test_batches_cover_every_pharmacy_in_order():
+    batches = _pack_batches(pharmacies(50), 'gpt-4o', estimate, 100, 300)
+    
+    assert [i for batch in batches for i in batch] == list(range(50))
+
+
+def test_batch_closes_at_target_input_tokens():
+    items = pharmacies(50)
+    batches = _pack_batches(items, 'gpt-4o', estimate, 100, 300)
+    
+    assert len(batches) > 1
+    for batch in batches:
+        rows = sum(estimate(_fmt_pharmacy(n, items[i])) for n, i in enumerate(batch, 1))
+        assert 100 + rows <= 300
+
+
+def test_max_batch_size_caps_pharmacies_per_batch():
+    batches = _pack_batches(pharmacies(10), 'gpt-4o', estimate, 100, 100_000, max_batch_size=3)
+    
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+
+
+def test_expected_output_fits_the_model_completion_limit():
+    batches = _pack_batches(pharmacies(500), 'gpt-4o', estimate, 100, 1_000_000)
+    
+    limit = MODEL_MAX_OUTPUT_TOKENS['gpt-4o'] // OUTPUT_TOKENS_PER_PHARMACY
+    assert max(len(batch) for batch in batches) == limit
+
+
+def test_oversized_pharmacy_gets_its_own_batch():
+    items = pharmacies(3)
+    items[1] = Pharmacy(StoreName='x' * 5000)
+    
+    assert _pack_batches(items, 'gpt-4o', estimate, 100, 300) == [[0], [1], [2]]
@@ -0,0 +1,100 @@
+import pandas as pd
+from tqdm import tqdm
+
+from fakes import FakeProvider
+
+
+def chunk(rows):
+    return pd.DataFrame({
+        'StoreName': [store for store, _ in rows],
+        'Operates in states': [states for _, states in rows],
+    })
+
+
+def slow_batches(batch):
+    """Batches starting at p2 and p6 answer after the batches that follow them."""
+    return {'p2': 0.03, 'p6': 0.06}.get(batch[0].StoreName, 0.01)
+
+
+def process(vps, df, provider, **settings):
+    """Run process_chunks on one chunk and return the row frames passed to write_rows."""
+    validator = vps.PharmacyStateValidator({'BATCH_SIZE': '2', **settings})
+    validator.ai_provider = provider
+    written = []
+    validator.process_chunks([df], tqdm(total=0, disable=True), written.append)
+    return written
+
+
+def test_rows_are_written_in_input_order_when_batches_finish_out_of_order(vps):
+    rows = [(f'p{i}', 'XX' if i % 2 else 'CA') for i in range(9)]
+    # Later batches answer first
+    provider = FakeProvider(delay=slow_batches)
+    
+    written = process(vps, chunk(rows), provider)
+    
+    assert [len(frame) for frame in written] == [2, 4, 3]
+    result = pd.concat(written)
+    assert list(result['StoreName']) == [store for store, _ in rows]
+    assert list(result[vps.CORRECT_COL]) == [states != 'XX' for _, states in rows]
+    assert list(result[vps.REASONING_COL]) == [f'checked {store}' for store, _ in rows]
+
+
+def test_each_write_continues_where_the_previous_one_ended(vps):
+    rows = [(f'p{i}', 'CA') for i in range(9)]
+    provider = FakeProvider(delay=slow_batches)
+    
+    written = process(vps, chunk(rows), provider)
+    
+    starts = [frame.index[0] for frame in written]
+    ends = [frame.index[-1] + 1 for frame in written]
+    assert starts == [0] + ends[:-1]
+    assert ends[-1] == len(rows)
+
+
+def test_duplicate_pharmacies_are_validated_once(vps):
+    rows = [('a', 'CA'), ('b', 'XX'), ('a', 'CA'), ('c', 'CA'), ('b', 'XX')]
+    provider = FakeProvider()
+    
+    result = pd.concat(process(vps, chunk(rows), provider))
+    
+    sent = sorted(pharmacy.StoreName for batch in provider.calls for pharmacy in batch)
+    assert sent == ['a', 'b', 'c']
+    assert list(result[vps.CORRECT_COL]) == [True, False, True, True, False]
+    assert list(result[vps.REASONING_COL]) == [f'checked {store}' for store, _ in rows]
+
+
+def test_failed_rows_have_no_verdict(vps):
+    rows = [('a', 'CA'), ('b', 'CA')]
+    provider = FakeProvider()
+    provider.answer = lambda batch: [{'pharmacy_index': 1, 'is_correct': None, 'confidence': 'error'}]
+    
+    result = pd.concat(process(vps, chunk(rows), provider))
+    
+    assert result[vps.CORRECT_COL].isna().all()
+    assert list(result[vps.CONFIDENCE_COL]) == ['error', '']
+    assert str(result[vps.CORRECT_COL].dtype) == 'boolean'
+
+
+def test_batches_of_later_chunks_keep_every_slot_busy(vps):
+    rows = [(f'p{i}', 'CA') for i in range(60)]
+    chunks = [chunk(rows[start:start + 6]) for start in range(0, len(rows), 6)]
+    # The first batch answers last
+    slow_first = lambda batch: 0.05 if batch[0].StoreName == 'p0' else 0.01
+    provider = FakeProvider({'MAX_CONCURRENCY': '8'}, delay=slow_first)
+    validator = vps.PharmacyStateValidator({'BATCH_SIZE': '2'})
+    validator.ai_provider = provider
+    written = []
+    chunk_ends = []
+    
+    validator.process_chunks(
+        iter(chunks),
+        tqdm(total=0, disable=True),
+        written.append,
+        lambda: chunk_ends.append(sum(len(frame) for frame in written))
+    )
+    
+    # Chunks are 3 batches each; later chunks fill the free slots while
+    # earlier ones drain, and rows still come out in input order
+    assert provider.peak_in_flight == 8
+    assert list(pd.concat(written)['StoreName']) == [store for store, _ in rows]
+    assert chunk_ends == list(range(6, 61, 6))
@@ -0,0 +1,78 @@
+import pytest
+
+import providers
+from providers import Pharmacy
+
+from fakes import FakeProvider
+
+PHARMACIES = [
+    Pharmacy(
+        StoreName=f'Express Scripts Pharmacy #{i}',
+        Address1='4750 E 450 S',
+        City='Whitestown',
+        State='IN',
+        ZipCode='46075',
+        OperatesInStates='AL, AK, AZ, AR, CA, CO, CT, DE, FL, GA',
+        NCPDPID=f'{1500000 + i}',
+    ) for i in range(30)
+]
+
+
+def labelled_blocks(pharmacies):
+    """The user message format used before the tab-separated rows."""
+    return "Pharmacies to validate:\n" + "".join(
+        f"\n{i}. Pharmacy: {p.StoreName}\n"
+        f"   Address: {p.Address1}, {p.City}, {p.State} {p.ZipCode}\n"
+        f"   Current listed states of operation: {p.OperatesInStates}\n"
+        f"   NCPDP ID: {p.NCPDPID}\n"
+        for i, p in enumerate(pharmacies, 1)
+    )
+
+
+def test_rows_use_30_percent_fewer_estimated_tokens():
+    provider = FakeProvider()
+    
+    rows = provider.count_tokens(provider.render_user_message(PHARMACIES))
+    blocks = provider.count_tokens(labelled_blocks(PHARMACIES))
+    
+    assert rows <= 0.7 * blocks
+
+
+def test_rows_use_30_percent_fewer_tiktoken_tokens():
+    encoding = providers._tiktoken_encoding('gpt-4o')
+    if encoding is None:
+        pytest.skip("tiktoken encoding not available")
+    provider = FakeProvider()
+    
+    rows = len(encoding.encode(provider.render_user_message(PHARMACIES)))
+    blocks = len(encoding.encode(labelled_blocks(PHARMACIES)))
+    
+    assert rows <= 0.7 * blocks
+
+
+def test_rows_are_numbered_and_tab_separated():
+    message = FakeProvider().render_user_message(PHARMACIES[:2])
+    lines = message.splitlines()
+    
+    assert lines[1] == "# idx\tname\taddress\tstates\tncpdpid"
+    assert lines[2].split("\t") == [
+        "1",
+        "Express Scripts Pharmacy #0",
+        "4750 E 450 S, Whitestown, IN 46075",
+        "AL, AK, AZ, AR, CA, CO, CT, DE, FL, GA",
+        "1500000",
+    ]
+    assert len(lines) == 4
+
+
+def test_from_record_keeps_values_in_their_column():
+    pharmacy = Pharmacy.from_record({
+        'StoreName': 'Main\tStreet\nPharmacy',
+        'City': float('nan'),
+        'Operates in states': 'CA,  NV',
+    })
+    
+    assert pharmacy.StoreName == 'Main Street Pharmacy'
+    assert pharmacy.City == 'N/A'
+    assert pharmacy.Address1 == 'N/A'
+    assert pharmacy.OperatesInStates == 'CA, NV'
@@ -0,0 +1,19 @@
+from providers import Pharmacy
+
+from fakes import FakeProvider
+
+
+def test_requests_per_minute_holds_across_calls():
+    provider = FakeProvider({'REQUESTS_PER_MINUTE': '2'})
+    
+    provider.validate_batches([[Pharmacy(StoreName='a')]])
+    provider.validate_batches([[Pharmacy(StoreName='b')]])
+    
+    # Both calls drew from one bucket, which is now empty
+    assert not provider.rate_limiter.has_capacity()
+
+
+def test_blank_requests_per_minute_is_unlimited():
+    provider = FakeProvider({'REQUESTS_PER_MINUTE': ''})
+    
+    assert provider.rate_limiter is None
@@ -0,0 +1,94 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+
+import pandas as pd
+import pytest
+
+from fakes import FakeProvider
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.join(REPO_DIR, 'tests')
+
+ROWS = [(f"p{i}", 'XX' if i % 3 == 0 else 'CA') for i in range(12)]
+SETTINGS = {'CSV_CHUNK_SIZE': '4', 'BATCH_SIZE': '2'}
+
+# Validates ROWS in chunks of 4 and is killed while validating p9,
+# i.e. after two chunks have been written
+CRASHING_RUN = textwrap.dedent(f"""
+    import os, signal, sys
+    sys.path[:0] = [{REPO_DIR!r}, {TESTS_DIR!r}]
+    from fakes import FakeProvider
+    import validate_pharmacy_states as vps
+    
+    def on_call(provider, batch):
+        if any(pharmacy.StoreName == 'p9' for pharmacy in batch):
+            os.kill(os.getpid(), signal.SIGKILL)
+    
+    validator = vps.PharmacyStateValidator({SETTINGS!r})
+    validator.output_filename = 'crashed.parquet'
+    validator.ai_provider = FakeProvider({{'MAX_CONCURRENCY': '1'}}, on_call=on_call)
+    validator.process_csv(sys.argv[1])
+""")
+
+
+def make_validator(vps, output, **settings):
+    validator = vps.PharmacyStateValidator({**SETTINGS, **settings})
+    validator.output_filename = output
+    validator.ai_provider = FakeProvider({'MAX_CONCURRENCY': '1'})
+    return validator
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGKILL'), reason="needs SIGKILL")
+def test_resume_after_kill(vps, write_csv, tmp_path):
+    csv_path = write_csv(ROWS)
+    crashed = subprocess.run([sys.executable, '-c', CRASHING_RUN, csv_path], cwd=tmp_path)
+    assert crashed.returncode == -signal.SIGKILL
+    
+    # The two finished chunks survive the kill as readable parts
+    assert len(pd.read_parquet('crashed.parquet')) == 8
+    
+    validator = make_validator(vps, 'resumed.parquet', RESUME_FROM='crashed.parquet')
+    summary = validator.process_csv(csv_path)
+    
+    sent = [pharmacy.StoreName for batch in validator.ai_provider.calls for pharmacy in batch]
+    assert sent == ['p8', 'p9', 'p10', 'p11']
+    assert summary == {'total': 12, 'correct': 8, 'incorrect': 4, 'errors': 0}
+    
+    result = pd.read_parquet('resumed.parquet')
+    assert list(result['StoreName']) == [store for store, _ in ROWS]
+    assert list(result[vps.CORRECT_COL]) == [states != 'XX' for _, states in ROWS]
+
+
+def test_resume_revalidates_trailing_rows_without_verdict(vps, write_csv):
+    csv_path = write_csv(ROWS)
+    first = make_validator(vps, 'first.parquet')
+    first.process_csv(csv_path)
+    
+    # Rewrite the output as if the last batch had failed
+    done = pd.read_parquet('first.parquet')
+    done[vps.CORRECT_COL] = done[vps.CORRECT_COL].astype('boolean')
+    done.loc[10:, vps.CORRECT_COL] = pd.NA
+    done.loc[10:, vps.CONFIDENCE_COL] = 'error'
+    done.to_parquet('failed.parquet', index=False)
+    
+    validator = make_validator(vps, 'resumed.parquet', RESUME_FROM='failed.parquet')
+    summary = validator.process_csv(csv_path)
+    
+    sent = [pharmacy.StoreName for batch in validator.ai_provider.calls for pharmacy in batch]
+    assert sent == ['p10', 'p11']
+    assert summary['errors'] == 0
+    
+    result = pd.read_parquet('resumed.parquet')
+    assert list(result[vps.CORRECT_COL]) == [states != 'XX' for _, states in ROWS]
+    assert set(result[vps.CONFIDENCE_COL]) == {'high'}
+
+
+def test_resume_from_missing_output_starts_from_first_row(vps, write_csv):
+    validator = make_validator(vps, 'resumed.parquet', RESUME_FROM='missing.parquet')
+    summary = validator.process_csv(write_csv(ROWS))
+    
+    assert len(validator.ai_provider.calls) == 6
+    assert summary['total'] == 12
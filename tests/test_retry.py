@@ -0,0 +1,29 @@
+import httpx
+import openai
+
+from providers import OpenAIProvider
+
+
+def make_provider():
+    return OpenAIProvider({'OPENAI_API_KEY': 'sk-test', 'OPENAI_MODEL': 'gpt-4o', 'VALIDATION_CACHE': ''})
+
+
+def rate_limit_error(code):
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    body = {'message': 'rate limited', 'type': code, 'code': code}
+    return openai.RateLimitError('rate limited', response=httpx.Response(429, request=request), body=body)
+
+
+def test_sdk_clients_do_not_retry_on_their_own():
+    provider = make_provider()
+    
+    assert provider.client.max_retries == 0
+    assert provider.aclient.max_retries == 0
+
+
+def test_rate_limits_are_retried():
+    assert make_provider().is_retryable_error(rate_limit_error('rate_limit_exceeded'))
+
+
+def test_exhausted_quota_is_not_retried():
+    assert not make_provider().is_retryable_error(rate_limit_error('insufficient_quota'))
@@ -0,0 +1,34 @@
+import pytest
+
+import providers
+import settings
+
+
+@pytest.fixture
+def dotenv_file(monkeypatch):
+    """Stand in for a .env file holding the given settings."""
+    
+    def use(values):
+        monkeypatch.setattr('dotenv.dotenv_values', lambda: dict(values))
+        settings.env_config.cache_clear()
+    
+    yield use
+    settings.env_config.cache_clear()
+
+
+def test_validator_reads_dotenv_by_default(vps, dotenv_file, monkeypatch):
+    monkeypatch.delenv('CSV_DIRECTORY', raising=False)
+    dotenv_file({'CSV_DIRECTORY': 'from-dotenv'})
+    
+    assert vps.PharmacyStateValidator().csv_directory == 'from-dotenv'
+
+
+def test_environment_takes_precedence_over_dotenv(dotenv_file, monkeypatch):
+    monkeypatch.setenv('AI_PROVIDER', 'google')
+    dotenv_file({'AI_PROVIDER': 'openai'})
+    
+    assert settings.env_config()['AI_PROVIDER'] == 'google'
+
+
+def test_validator_and_providers_share_the_settings(vps):
+    assert vps.PharmacyStateValidator().config is providers.env_config()
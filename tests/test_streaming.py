@@ -0,0 +1,54 @@
+import json
+from types import SimpleNamespace
+
+from providers import OpenAIProvider, Pharmacy
+
+
+def streaming_provider(content, piece_size=20):
+    """An OpenAIProvider whose streamed response is ``content``, sent in pieces."""
+    provider = OpenAIProvider({
+        'OPENAI_API_KEY': 'sk-test',
+        'OPENAI_MODEL': 'gpt-4o',
+        'STREAM_RESPONSES': 'true',
+        'VALIDATION_CACHE': '',
+    })
+    
+    async def create(stream, **request):
+        async def chunks():
+            for start in range(0, len(content), piece_size):
+                delta = SimpleNamespace(content=content[start:start + piece_size])
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+        return chunks()
+    
+    provider.aclient = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    provider._warmed_up = True
+    return provider
+
+
+def validation(index):
+    return {
+        "pharmacy_index": index,
+        "is_correct": True,
+        "corrected_states": "",
+        "confidence": "high",
+        "reasoning": f"checked {index}"
+    }
+
+
+def test_streamed_validations_are_parsed():
+    content = json.dumps({"validations": [validation(1), validation(2)]})
+    provider = streaming_provider(content)
+    
+    [results] = provider.validate_batches([[Pharmacy(StoreName='a'), Pharmacy(StoreName='b')]])
+    
+    assert [v['reasoning'] for v in results] == ['checked 1', 'checked 2']
+
+
+def test_truncated_stream_keeps_the_complete_validations():
+    content = json.dumps({"validations": [validation(1), validation(2), validation(3)]})
+    # Cut the response off inside the third validation
+    provider = streaming_provider(content[:content.index('"pharmacy_index": 3') + 10])
+    
+    [results] = provider.validate_batches([[Pharmacy(StoreName=name) for name in 'abc']])
+    
+    assert [(v['pharmacy_index'], v['confidence']) for v in results] == [(1, 'high'), (2, 'high')]
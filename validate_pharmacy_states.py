@@ -21,29 +21,29 @@ Usage:
 Author: Generated for MEDvidi Pharmacy Verification
 """
 
-import pandas as pd
+import collections
+import csv
+import functools
+import glob
 import os
 import sys
-import time
-from typing import List, Dict, Any
-from tqdm import tqdm
+from typing import TYPE_CHECKING, List, Dict, Any, Deque, Iterable, Mapping, Optional
 import logging
 from datetime import datetime
-from dotenv import load_dotenv
-from providers import get_ai_provider
 
-# Load environment variables first
-load_dotenv()
+from settings import env_config
 
-# Configuration
-CSV_DIRECTORY = os.getenv('CSV_DIRECTORY', 'CSVs')
-CSV_FILENAME = os.path.join(CSV_DIRECTORY, os.getenv('CSV_FILENAME', 'Mail order active EPCS pharmacies w states - Master 31 Jul 2025.csv'))
-OUTPUT_FILENAME = f"validated_pharmacies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-BATCH_SIZE = int(os.getenv('BATCH_SIZE', '30'))
-RATE_LIMIT_DELAY = int(os.getenv('RATE_LIMIT_DELAY', '2'))  # seconds between API calls
+# pandas, tqdm and the provider SDKs are imported where they are used, so
+# early exits (missing CSV or API key) do not pay for loading them
+if TYPE_CHECKING:
+    import pandas as pd
 
-# AI Provider Configuration
-AI_PROVIDER = os.getenv('AI_PROVIDER', 'openai').lower()  # 'openai' or 'google'
+
+# Result columns added to the output; the corrected-states column is named
+# after the provider (see PharmacyStateValidator.states_col)
+CORRECT_COL = 'Initial states of operation correct'
+CONFIDENCE_COL = 'Validation confidence'
+REASONING_COL = 'Validation reasoning'
 
 # Model Configuration - Set your preferred model per provider
 # OpenAI Models:
@@ -66,122 +66,440 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# API key setting required by each supported provider
+API_KEY_SETTINGS = {'openai': 'OPENAI_API_KEY', 'google': 'GOOGLE_API_KEY'}
+
+
+class ConfigError(Exception):
+    """The configuration or input file cannot be used."""
+
+
+class ProcessingError(Exception):
+    """Validation or export failed part way through."""
+
+
+def _part_files(path: str) -> List[str]:
+    """Return the Parquet files of an output, in row order.
+    
+    Outputs are directories of part files; a single Parquet file is also accepted.
+    """
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, 'part-*.parquet')))
+    return [path] if os.path.isfile(path) else []
+
+
+def _unpack(validation: Dict) -> tuple:
+    """Return a validation's result values in result column order."""
+    return (
+        validation.get('is_correct'),
+        validation.get('corrected_states', ''),
+        validation.get('confidence', ''),
+        validation.get('reasoning', ''),
+    )
+
+
+class _Chunk:
+    """Batches and results of one chunk of CSV rows.
+    
+    Identical pharmacies are validated once and their result is copied to
+    every duplicate row. Results are kept per unique pharmacy in typed
+    arrays and attached to the rows as they are written.
+    """
+    
+    def __init__(self, df: 'pd.DataFrame', provider, result_cols: tuple, max_batch_size: int):
+        import numpy as np
+        from providers import Pharmacy, PROMPT_COLS
+        
+        self.result_cols = result_cols
+        # Result columns are attached to the rows as they are written
+        self.df = df.drop(columns=list(result_cols), errors='ignore')
+        
+        # Only the prompt columns are boxed into Python objects; absent ones become 'N/A'
+        records = self.df.reindex(columns=PROMPT_COLS).to_dict('records')
+        
+        # Rows with the same prompt fields share one validation
+        unique_index: Dict[Pharmacy, int] = {}
+        self.row_to_unique = np.fromiter(
+            (unique_index.setdefault(Pharmacy.from_record(record), len(unique_index)) for record in records),
+            dtype=np.intp,
+            count=len(records)
+        )
+        pharmacies = list(unique_index)
+        if len(pharmacies) < len(records):
+            logger.info(f"{len(records) - len(pharmacies)} duplicate pharmacies in chunk share a validation")
+        
+        # Pack pharmacies into batches of about TARGET_TOKENS input tokens
+        # (at most max_batch_size pharmacies each, if set); each batch lists
+        # the positions of its pharmacies
+        self.index_batches = provider.pack_batches(pharmacies, max_batch_size)
+        self.batches = [[pharmacies[i] for i in indexes] for indexes in self.index_batches]
+        self.unique_batch = [0] * len(pharmacies)
+        for number, indexes in enumerate(self.index_batches):
+            for i in indexes:
+                self.unique_batch[i] = number
+        self.completed = [False] * len(self.batches)
+        self.batches_done = 0
+        # A verdict without has_verdict set is <NA>
+        self.verdicts = np.zeros(len(pharmacies), dtype=bool)
+        self.has_verdict = np.zeros(len(pharmacies), dtype=bool)
+        self.texts = [np.full(len(pharmacies), "", dtype=object) for _ in result_cols[1:]]
+        self.next_to_write = 0
+    
+    def results_for(self, rows: slice) -> 'pd.DataFrame':
+        """Return the result columns for a range of rows."""
+        import pandas as pd
+        
+        uniques = self.row_to_unique[rows]
+        columns = {CORRECT_COL: pd.arrays.BooleanArray(self.verdicts[uniques], ~self.has_verdict[uniques])}
+        for column, values in zip(self.result_cols[1:], self.texts):
+            columns[column] = pd.array(values[uniques], dtype='string[pyarrow]')
+        return pd.DataFrame(columns, index=self.df.index[rows])
+    
+    def apply_batch(self, batch_number: int, validations: List[Dict]):
+        """Record one batch's results."""
+        indexes = self.index_batches[batch_number]
+        for validation in validations:
+            try:
+                pharmacy_idx = validation.get('pharmacy_index', 1) - 1  # Convert to 0-based
+                
+                if 0 <= pharmacy_idx < len(indexes):
+                    unique = indexes[pharmacy_idx]
+                    is_correct, *values = _unpack(validation)
+                    if isinstance(is_correct, bool):
+                        self.verdicts[unique] = is_correct
+                        self.has_verdict[unique] = True
+                    for column, value in zip(self.texts, values):
+                        column[unique] = value
+                    
+            except Exception as e:
+                logger.error(f"Error applying validation result: {str(e)}")
+                continue
+        self.completed[batch_number] = True
+        self.batches_done += 1
+    
+    def write_ready(self, write_rows) -> bool:
+        """Write the completed run of rows that follows the rows already written.
+        
+        Batches finish out of order, so rows are only written once every
+        earlier row is done and the output keeps the input order. Returns
+        True once every row of the chunk has been written.
+        """
+        import pandas as pd
+        
+        first = self.next_to_write
+        while (
+            self.next_to_write < len(self.df)
+            and self.completed[self.unique_batch[self.row_to_unique[self.next_to_write]]]
+        ):
+            self.next_to_write += 1
+        if self.next_to_write > first:
+            rows = slice(first, self.next_to_write)
+            write_rows(pd.concat([self.df.iloc[rows], self.results_for(rows)], axis=1))
+        return self.next_to_write == len(self.df)
+
+
 class PharmacyStateValidator:
-    def __init__(self):
-        """Initialize the validator with the configured AI provider."""
-        self.setup_ai_provider()
+    def __init__(self, config: Optional[Mapping[str, str]] = None):
+        """Read the settings from ``config`` (default: env_config())."""
+        self.config = config if config is not None else env_config()
         
-    def setup_ai_provider(self):
-        """Set up AI provider based on configuration."""
-        try:
-            self.ai_provider = get_ai_provider(AI_PROVIDER)
-            logger.info(f"AI provider '{AI_PROVIDER}' initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize AI provider '{AI_PROVIDER}': {str(e)}")
-            sys.exit(1)
+        # Configuration
+        self.csv_directory = self.config.get('CSV_DIRECTORY', 'CSVs')
+        self.csv_filename = os.path.join(self.csv_directory, self.config.get('CSV_FILENAME', 'Mail order active EPCS pharmacies w states - Master 31 Jul 2025.csv'))
+        self.output_filename = f"validated_pharmacies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet"
+        # Also export the results as CSV once validation finishes
+        self.export_csv_enabled = self.config.get('EXPORT_CSV', '0').lower() in ('1', 'true')
+        self.csv_output_filename = self.output_filename[:-len('.parquet')] + '.csv'
+        # Optional cap on pharmacies per batch; batches are sized by TARGET_TOKENS
+        self.batch_size = int(self.config.get('BATCH_SIZE') or '0')
+        # Rows read from the CSV at a time; each chunk is split into concurrent batches
+        self.csv_chunk_size = int(self.config.get('CSV_CHUNK_SIZE') or '1000')
+        # Output of an interrupted run whose validated rows are reused
+        self.resume_from = self.config.get('RESUME_FROM')
+        
+        # AI Provider Configuration
+        self.ai_provider_name = self.config.get('AI_PROVIDER', 'openai').lower()  # 'openai' or 'google'
+        
+        # Result columns added to the output, in order
+        self.states_col = f'States of operation by {self.ai_provider_name.upper()} AI'
+        self.result_cols = (CORRECT_COL, self.states_col, CONFIDENCE_COL, REASONING_COL)
 
-    def load_csv(self, filename: str) -> pd.DataFrame:
-        """Load and validate CSV file."""
+    @functools.cached_property
+    def ai_provider(self):
+        """The configured AI provider, set up on first use and shared process-wide."""
         try:
-            df = pd.read_csv(filename)
-            logger.info(f"Loaded CSV with {len(df)} rows and {len(df.columns)} columns")
-            
-            # Check if required column exists
-            if 'Operates in states' not in df.columns:
-                logger.error("'Operates in states' column not found in CSV!")
-                logger.error(f"Available columns: {list(df.columns)}")
-                sys.exit(1)
-                
-            return df
-        except FileNotFoundError:
-            logger.error(f"CSV file '{filename}' not found!")
-            sys.exit(1)
+            from providers import get_ai_provider
+            provider = get_ai_provider(self.ai_provider_name, self.config)
+            logger.info(f"AI provider '{self.ai_provider_name}' initialized successfully")
+            return provider
         except Exception as e:
-            logger.error(f"Error loading CSV: {str(e)}")
-            sys.exit(1)
+            raise ConfigError(f"Failed to initialize AI provider '{self.ai_provider_name}': {str(e)}") from e
+
+    def preflight(self):
+        """Check the settings and CSV header without importing pandas or a provider SDK.
+        
+        Raises ConfigError describing the first problem found.
+        """
+        if self.ai_provider_name not in API_KEY_SETTINGS:
+            raise ConfigError(
+                f"Unknown AI provider: {self.ai_provider_name}\n"
+                "Supported providers: 'openai', 'google'"
+            )
+        
+        key_setting = API_KEY_SETTINGS[self.ai_provider_name]
+        if not self.config.get(key_setting):
+            raise ConfigError(
+                f"{key_setting} not found!\n"
+                "Please set it using one of these methods:\n"
+                f"1. Environment variable: export {key_setting}='your-key-here'\n"
+                f"2. Create .env file with: {key_setting}=your-key-here"
+            )
+        
+        if not os.path.exists(self.csv_filename):
+            raise ConfigError(
+                f"CSV file '{self.csv_filename}' not found!\n"
+                "Please ensure the CSV file exists in the specified location.\n"
+                f"Expected directory: {self.csv_directory}\n"
+                "You can configure the CSV location in .env file:\n"
+                "  CSV_DIRECTORY=your-directory\n"
+                "  CSV_FILENAME=your-filename.csv"
+            )
+        
+        # Only the header row is needed to check the required column
+        with open(self.csv_filename, newline='', encoding='utf-8-sig') as f:
+            header = next(csv.reader(f), [])
+        if 'Operates in states' not in header:
+            raise ConfigError(
+                "'Operates in states' column not found in CSV!\n"
+                f"Available columns: {header}"
+            )
 
     def validate_batch_with_ai(self, batch: List[Dict]) -> List[Dict]:
-        """Validate a batch of pharmacies using the configured AI provider."""
-        return self.ai_provider.validate_batch_with_ai(batch)
+        """Validate a batch of pharmacy CSV rows (column name -> value) using the configured AI provider."""
+        from providers import Pharmacy
+        return self.ai_provider.validate_batch_with_ai([Pharmacy.from_record(record) for record in batch])
+
+    def process_chunks(self, chunks: Iterable['pd.DataFrame'], progress, write_rows, chunk_written=None):
+        """Validate chunks of rows in batches and write them with the result columns.
+        
+        Batches of consecutive chunks share one pipeline: the next chunk is
+        read and its batches started as soon as a concurrency slot is free, so
+        MAX_CONCURRENCY requests stay in flight across chunk boundaries. Rows
+        are passed to ``write_rows`` in input order as soon as the batches
+        holding them and every earlier row have completed, and
+        ``chunk_written()`` is called after the last row of each chunk.
+        """
+        # Chunks not fully written yet, oldest first
+        pending: Deque[_Chunk] = collections.deque()
+        # Chunk and number within it of each batch, by pipeline batch number
+        batch_chunks: Dict[int, tuple] = {}
+        # Finished batches held back by an unfinished earlier one; no further
+        # chunk is read while this many are waiting to be written
+        backlog_limit = 2 * self.ai_provider.max_concurrency
+        
+        def write_finished():
+            """Write the completed rows that follow the rows already written."""
+            while pending and pending[0].write_ready(write_rows):
+                pending.popleft()
+                if chunk_written is not None:
+                    chunk_written()
+        
+        def batches():
+            number = 0
+            for df in chunks:
+                while sum(chunk.batches_done for chunk in pending) >= backlog_limit:
+                    yield None
+                chunk = _Chunk(df, self.ai_provider, self.result_cols, self.batch_size)
+                pending.append(chunk)
+                progress.total = (progress.total or 0) + len(chunk.batches)
+                progress.refresh()
+                for chunk_batch, batch in enumerate(chunk.batches):
+                    batch_chunks[number] = (chunk, chunk_batch)
+                    number += 1
+                    yield batch
+                # A chunk without rows has nothing to wait for
+                write_finished()
+        
+        def apply_batch(batch_number: int, validations: List[Dict]):
+            """Record one batch's results and write the rows now finished."""
+            chunk, chunk_batch = batch_chunks.pop(batch_number)
+            chunk.apply_batch(chunk_batch, validations)
+            progress.update(1)
+            write_finished()
+        
+        # Validate batches concurrently; results are applied as each batch completes
+        self.ai_provider.validate_stream(batches(), on_result=apply_batch)
 
-    def process_csv(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Process the entire CSV in batches, saving after each successful batch."""
+    def resume_rows(self, write_rows) -> int:
+        """Copy the validated rows of RESUME_FROM to the output; return how many.
         
-        # Add new columns
-        df['Initial states of operation correct'] = None
-        df[f'States of operation by {AI_PROVIDER.upper()} AI'] = ""
-        df['Validation confidence'] = ""
-        df['Validation reasoning'] = ""
+        RESUME_FROM is the output of an earlier run. Only its complete part
+        files are read, so an output left behind by a crash can be resumed.
+        Rows up to the last one with a verdict are reused as they are, so the
+        remaining input rows are the only ones sent to the AI provider.
+        """
+        import pandas as pd
+        import pyarrow.parquet as pq
         
-        # Process in batches
-        total_batches = (len(df) + BATCH_SIZE - 1) // BATCH_SIZE
-        logger.info(f"Processing {len(df)} pharmacies in {total_batches} batches of {BATCH_SIZE}")
+        if not self.resume_from:
+            return 0
+        parts = _part_files(self.resume_from)
+        if not parts:
+            logger.warning(f"No results found in '{self.resume_from}', starting from the first row")
+            return 0
         
-        for batch_idx in tqdm(range(0, len(df), BATCH_SIZE), desc="Processing batches"):
-            batch_end = min(batch_idx + BATCH_SIZE, len(df))
-            batch_df = df.iloc[batch_idx:batch_end].copy()
+        # Only the verdict column is read to find where to pick up
+        mask = pd.concat(
+            [pq.read_table(part, columns=[CORRECT_COL]).column(0).to_pandas() for part in parts],
+            ignore_index=True
+        ).notna()
+        start_idx = int(mask[::-1].idxmax()) + 1 if mask.any() else 0
+        
+        # Stream the finished rows into the new output in their original order
+        remaining = start_idx
+        for part in parts:
+            for batch in pq.ParquetFile(part).iter_batches():
+                if remaining <= 0:
+                    break
+                batch = batch.slice(0, remaining)
+                write_rows(batch.to_pandas())
+                remaining -= batch.num_rows
+        
+        logger.info(f"Resuming from '{self.resume_from}': {start_idx} pharmacies already validated")
+        return start_idx
+
+    def process_csv(self, filename: str) -> Dict[str, int]:
+        """Stream the CSV in chunks, appending validated rows to the Parquet output.
+        
+        Only chunks whose rows are not all written yet are held in memory
+        (see process_chunks). The output is a directory with one part file
+        per chunk; a part is written under a hidden temporary name and
+        renamed once closed, so after a crash every visible part is complete
+        and readable. Returns summary counts.
+        """
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from tqdm import tqdm
+        
+        summary = {'total': 0, 'correct': 0, 'incorrect': 0, 'errors': 0}
+        progress = tqdm(total=0, desc="Processing batches")
+        rows_written = 0
+        schema = None
+        writer = None
+        part_number = 0
+        
+        def part_path(hidden: bool = False) -> str:
+            name = f"part-{part_number:05d}.parquet"
+            return os.path.join(self.output_filename, f".{name}.tmp" if hidden else name)
+        
+        def write_rows(rows: 'pd.DataFrame'):
+            """Append validated rows to the open part file."""
+            nonlocal rows_written, schema, writer
+            if schema is None:
+                # Input columns are read as text; only the verdict is typed
+                schema = pa.schema([
+                    (column, pa.bool_() if column == CORRECT_COL else pa.string())
+                    for column in rows.columns
+                ])
+                os.makedirs(self.output_filename, exist_ok=True)
+            if writer is None:
+                writer = pq.ParquetWriter(part_path(hidden=True), schema, compression='zstd')
+            writer.write_table(pa.Table.from_pandas(rows, schema=schema, preserve_index=False))
+            rows_written += len(rows)
             
-            # Convert batch to list of dictionaries
-            batch_pharmacies = batch_df.to_dict('records')
+            # One pass over the verdicts; missing ones count as errors
+            counts = (
+                rows[CORRECT_COL]
+                .map({True: 'correct', False: 'incorrect'})
+                .fillna('errors')
+                .value_counts()
+            )
+            summary['total'] += len(rows)
+            for outcome in ('correct', 'incorrect', 'errors'):
+                summary[outcome] += int(counts.get(outcome, 0))
+        
+        def close_part():
+            """Finish the open part file and publish it under its final name."""
+            nonlocal writer, part_number
+            if writer is None:
+                return
+            writer.close()
+            writer = None
+            os.replace(part_path(hidden=True), part_path())
+            part_number += 1
+        
+        try:
+            start_idx = self.resume_rows(write_rows)
+            close_part()
             
-            # Validate with AI provider
-            validations = self.validate_batch_with_ai(batch_pharmacies)
+            # Read every column as text: NCPDP IDs and ZIP codes keep their
+            # leading zeros and each chunk has the same Parquet schema.
+            # Rows reused from RESUME_FROM are skipped (the header is kept)
+            read_options = dict(dtype=str, skiprows=range(1, start_idx + 1))
+            if self.ai_provider.SUBMITS_ONE_JOB:
+                # One Batch API job for the whole file, not one per chunk
+                reader = [pd.read_csv(filename, **read_options)]
+            else:
+                reader = pd.read_csv(filename, chunksize=self.csv_chunk_size, **read_options)
             
-            # Apply results back to dataframe
-            batch_successful = False
-            for validation in validations:
-                try:
-                    pharmacy_idx = validation.get('pharmacy_index', 1) - 1  # Convert to 0-based
-                    actual_idx = batch_idx + pharmacy_idx
+            def chunks():
+                for chunk_number, chunk in enumerate(reader):
+                    if chunk_number == 0 and 'Operates in states' not in chunk.columns:
+                        raise ConfigError(
+                            "'Operates in states' column not found in CSV!\n"
+                            f"Available columns: {list(chunk.columns)}"
+                        )
                     
-                    if actual_idx < len(df):
-                        df.loc[actual_idx, 'Initial states of operation correct'] = validation.get('is_correct')
-                        df.loc[actual_idx, f'States of operation by {AI_PROVIDER.upper()} AI'] = validation.get('corrected_states', '')
-                        df.loc[actual_idx, 'Validation confidence'] = validation.get('confidence', '')
-                        df.loc[actual_idx, 'Validation reasoning'] = validation.get('reasoning', '')
-                        batch_successful = True
-                        
-                except Exception as e:
-                    logger.error(f"Error applying validation result: {str(e)}")
-                    continue
+                    logger.info(f"Processing chunk {chunk_number + 1} ({len(chunk)} pharmacies)")
+                    yield chunk
             
-            # Save progress after each successful batch
-            if batch_successful:
-                try:
-                    df.to_csv(OUTPUT_FILENAME, index=False)
-                    logger.info(f"Progress saved: Batch {batch_idx//BATCH_SIZE + 1}/{total_batches} completed")
-                except Exception as e:
-                    logger.error(f"Error saving progress: {str(e)}")
+            def chunk_written():
+                close_part()
+                logger.info(f"Progress saved: {rows_written} pharmacies written to {self.output_filename}")
             
-            # Rate limiting
-            if batch_idx + BATCH_SIZE < len(df):  # Don't delay after the last batch
-                logger.info(f"Waiting {RATE_LIMIT_DELAY} seconds before next batch...")
-                time.sleep(RATE_LIMIT_DELAY)
+            self.process_chunks(chunks(), progress, write_rows, chunk_written)
+        except ConfigError:
+            raise
+        except Exception as e:
+            raise ProcessingError(f"Error processing CSV: {str(e)}") from e
+        finally:
+            progress.close()
+            # Rows written so far are complete, so keep them on any exit
+            close_part()
         
-        return df
+        return summary
 
-    def save_results(self, df: pd.DataFrame, output_filename: str):
-        """Save the validated results to a new CSV file."""
+    def export_csv(self, output_filename: str):
+        """Export the Parquet results to CSV one record batch at a time."""
+        import pyarrow.parquet as pq
+        
         try:
-            df.to_csv(output_filename, index=False)
-            logger.info(f"Results saved to: {output_filename}")
-            
-            # Print summary statistics
-            total_pharmacies = len(df)
-            correct_count = len(df[df['Initial states of operation correct'] == True])
-            incorrect_count = len(df[df['Initial states of operation correct'] == False])
-            error_count = len(df[df['Initial states of operation correct'].isna()])
-            
-            logger.info(f"\nValidation Summary (AI Provider: {AI_PROVIDER}):")
-            logger.info(f"Total pharmacies: {total_pharmacies}")
-            logger.info(f"Correct states of operation: {correct_count}")
-            logger.info(f"Incorrect states of operation: {incorrect_count}")
-            logger.info(f"Validation errors: {error_count}")
-            logger.info(f"Success rate: {((correct_count + incorrect_count) / total_pharmacies * 100):.1f}%")
-            
+            batches = (
+                batch
+                for part in _part_files(self.output_filename)
+                for batch in pq.ParquetFile(part).iter_batches()
+            )
+            for i, batch in enumerate(batches):
+                batch.to_pandas().to_csv(output_filename, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            logger.info(f"Results exported to: {output_filename}")
         except Exception as e:
-            logger.error(f"Error saving results: {str(e)}")
-            sys.exit(1)
+            raise ProcessingError(f"Error exporting results to CSV: {str(e)}") from e
+
+    def log_summary(self, summary: Dict[str, int]):
+        """Log summary statistics for the validated pharmacies."""
+        total_pharmacies = summary['total']
+        correct_count = summary['correct']
+        incorrect_count = summary['incorrect']
+        
+        logger.info(f"Results saved to: {self.output_filename}")
+        logger.info(f"\nValidation Summary (AI Provider: {self.ai_provider_name}):")
+        logger.info(f"Total pharmacies: {total_pharmacies}")
+        logger.info(f"Correct states of operation: {correct_count}")
+        logger.info(f"Incorrect states of operation: {incorrect_count}")
+        logger.info(f"Validation errors: {summary['errors']}")
+        if total_pharmacies:
+            logger.info(f"Success rate: {((correct_count + incorrect_count) / total_pharmacies * 100):.1f}%")
 
 
 def main():
@@ -189,34 +507,32 @@ def main():
     logger.info("Starting Pharmacy States of Operation Validation")
     logger.info("=" * 50)
     
-    # Load environment variables first
-    load_dotenv()
-    logger.info("Environment variables loaded from .env file (if present)")
-    
-    # Check if CSV file exists
-    if not os.path.exists(CSV_FILENAME):
-        logger.error(f"CSV file '{CSV_FILENAME}' not found!")
-        logger.error(f"Please ensure the CSV file exists in the specified location.")
-        logger.error(f"Expected directory: {CSV_DIRECTORY}")
-        logger.error(f"You can configure the CSV location in .env file:")
-        logger.error(f"  CSV_DIRECTORY=your-directory")
-        logger.error(f"  CSV_FILENAME=your-filename.csv")
-        sys.exit(1)
-    
-    # Initialize validator
-    validator = PharmacyStateValidator()
-    
-    # Load CSV
-    df = validator.load_csv(CSV_FILENAME)
+    # Settings from the .env file (if present); the environment takes precedence
+    config = env_config()
+    logger.info("Configuration loaded from .env file (if present) and the environment")
     
-    # Process CSV (saves progress after each successful batch)
-    validated_df = validator.process_csv(df)
+    # Initialize validator (cheap: pandas and the provider SDK load on first use)
+    validator = PharmacyStateValidator(config=config)
     
-    # Final save and summary
-    validator.save_results(validated_df, OUTPUT_FILENAME)
+    try:
+        # Fail fast on configuration problems before any heavy imports
+        validator.preflight()
+        
+        # Process CSV chunk by chunk (validated rows are appended as batches complete)
+        summary = validator.process_csv(validator.csv_filename)
+        
+        # Summary
+        validator.log_summary(summary)
+        
+        if validator.export_csv_enabled:
+            validator.export_csv(validator.csv_output_filename)
+    except (ConfigError, ProcessingError) as e:
+        for line in str(e).splitlines():
+            logger.error(line)
+        sys.exit(1)
     
     logger.info("Validation completed successfully!")
-    logger.info(f"Check the output file: {OUTPUT_FILENAME}")
+    logger.info(f"Check the output file: {validator.output_filename}")
 
 
 if __name__ == "__main__":